@@ -22,7 +22,8 @@ class DatabaseConnection:
                 DATABASE_URL,
                 min_size=2,
                 max_size=10,
-                command_timeout=60
+                command_timeout=60,
+                statement_cache_size=256  # keep hot query plans prepared
             )
         return cls._pool
     
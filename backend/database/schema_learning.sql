@@ -94,6 +94,13 @@ CREATE TABLE IF NOT EXISTS user_feedback (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- array_to_string is only STABLE, which PostgreSQL rejects in generated
+-- columns; this wrapper is safe to mark IMMUTABLE for text[] input
+CREATE OR REPLACE FUNCTION immutable_array_to_string(text[], text)
+RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS 'SELECT array_to_string($1, $2)';
+
 -- Learned symptom-to-cause patterns (discovered from successful resolutions)
 CREATE TABLE IF NOT EXISTS learned_patterns (
     id SERIAL PRIMARY KEY,
@@ -108,9 +115,20 @@ CREATE TABLE IF NOT EXISTS learned_patterns (
     source VARCHAR(20) DEFAULT 'learned',  -- 'base', 'learned'
     first_discovered TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    approved BOOLEAN DEFAULT FALSE  -- Human review flag
+    approved BOOLEAN DEFAULT FALSE,  -- Human review flag
+    -- Canonical key; the learning pipeline stores symptom_combination
+    -- pre-sorted, so this matches Python's "_".join(sorted(...)) without
+    -- re-sorting on either side
+    symptom_key TEXT GENERATED ALWAYS AS (immutable_array_to_string(symptom_combination, '_')) STORED
 );
 
+-- Migration for databases created before symptom_key existed: the
+-- CREATE TABLE IF NOT EXISTS above is a no-op there, so add the column
+-- explicitly (PostgreSQL backfills generated columns on ADD COLUMN)
+ALTER TABLE learned_patterns
+    ADD COLUMN IF NOT EXISTS symptom_key TEXT
+    GENERATED ALWAYS AS (immutable_array_to_string(symptom_combination, '_')) STORED;
+
 -- Learned questions (generated from common unclear cases)
 CREATE TABLE IF NOT EXISTS learned_questions (
     id SERIAL PRIMARY KEY,
@@ -197,6 +215,8 @@ CREATE INDEX idx_learned_patterns_category ON learned_patterns(category);
 CREATE INDEX idx_learned_patterns_cause ON learned_patterns(cause);
 CREATE INDEX idx_learned_patterns_confidence ON learned_patterns(confidence);
 CREATE INDEX idx_learned_patterns_approved ON learned_patterns(approved);
+CREATE INDEX IF NOT EXISTS idx_learned_patterns_symptom_key
+    ON learned_patterns(category, symptom_key, cause);
 
 CREATE INDEX idx_learned_questions_category ON learned_questions(category);
 CREATE INDEX idx_learned_questions_context ON learned_questions(issue_context);
@@ -207,7 +227,61 @@ CREATE INDEX idx_pattern_candidates_reviewed ON pattern_candidates(reviewed);
 
 CREATE INDEX idx_image_caption_hash ON image_caption_cache(image_hash);
 
+-- Partial indexes for the hot diagnostic reads: both tables are always
+-- filtered by approved = true AND category = $1, so a small partial
+-- b-tree serves the lookup in one scan (keep the literal approved = true
+-- predicate in queries so the planner matches it)
+CREATE INDEX IF NOT EXISTS learned_patterns_cat_approved
+    ON learned_patterns(category) WHERE approved = true;
+CREATE INDEX IF NOT EXISTS learned_questions_cat_approved
+    ON learned_questions(category) WHERE approved = true;
+
+-- Hot predicates of the learning-cycle queries: all scan a recent
+-- created_at / answer_timestamp window with extra filters, so without
+-- these every cycle is a full table scan. (Build with CONCURRENTLY when
+-- applying to a live database.)
+CREATE INDEX IF NOT EXISTS idx_diagnostic_sessions_learnable
+    ON diagnostic_sessions(created_at)
+    WHERE final_diagnosis IS NOT NULL AND tutorial_selected_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_question_interactions_recent
+    ON question_interactions(answer_timestamp)
+    INCLUDE (question_id, session_id, information_gain, was_skipped);
+CREATE INDEX IF NOT EXISTS idx_belief_snapshots_session_desc
+    ON belief_snapshots(session_id, snapshot_order DESC);
+
 -- GIN indexes for array columns
 CREATE INDEX idx_learned_patterns_symptoms ON learned_patterns USING GIN(symptom_combination);
 CREATE INDEX idx_pattern_candidates_symptoms ON pattern_candidates USING GIN(symptom_combination);
 CREATE INDEX idx_diagnostic_sessions_symptoms ON diagnostic_sessions USING GIN(initial_symptoms);
+
+-- Single round-trip bootstrap for a diagnostic session: both
+-- category-scoped reads in one call, one plan
+CREATE OR REPLACE FUNCTION diagnostic_bootstrap(_cat TEXT)
+RETURNS TABLE(kind TEXT, payload JSONB) AS $$
+    SELECT 'lp', to_jsonb(lp.*)
+    FROM learned_patterns lp
+    WHERE lp.approved = true AND lp.category = _cat
+    UNION ALL
+    SELECT 'lq', to_jsonb(lq.*)
+    FROM learned_questions lq
+    WHERE lq.approved = true AND lq.category = _cat
+$$ LANGUAGE sql STABLE;
+
+-- Cache invalidation: notify listeners when learned rows change so the
+-- in-process caches in BeliefEngine drop stale entries immediately
+CREATE OR REPLACE FUNCTION notify_learned_change() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify(TG_ARGV[0], COALESCE(NEW.category, OLD.category, ''));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS learned_patterns_notify ON learned_patterns;
+CREATE TRIGGER learned_patterns_notify
+    AFTER INSERT OR UPDATE OR DELETE ON learned_patterns
+    FOR EACH ROW EXECUTE FUNCTION notify_learned_change('learned_patterns_changed');
+
+DROP TRIGGER IF EXISTS learned_questions_notify ON learned_questions;
+CREATE TRIGGER learned_questions_notify
+    AFTER INSERT OR UPDATE OR DELETE ON learned_questions
+    FOR EACH ROW EXECUTE FUNCTION notify_learned_change('learned_questions_changed');
@@ -5,7 +5,7 @@ PostgreSQL table structure following the PRD specification.
 """
 
 from sqlalchemy import (
-    Column, Integer, String, Float, JSON, ARRAY, 
+    Column, Integer, String, Float, ARRAY, Index,
     Text, Enum as SQLEnum, create_engine
 )
 from sqlalchemy.ext.declarative import declarative_base
@@ -38,18 +38,33 @@ class RepairProcedure(Base):
     | Source | Steps | Images | RiskLevel | Tools | Warnings | Recovery |
     """
     __tablename__ = "repair_procedures"
-    
+
+    __table_args__ = (
+        # Canonical lookup is "this model, this issue" - one composite
+        # b-tree seek instead of bitmap-ANDing two single-column indexes
+        # (the composite prefix also covers device_model-only scans)
+        Index("ix_repair_model_issue", "device_model", "issue"),
+        # Symptom-pattern containment lookups (symptom_pattern @> probe);
+        # jsonb_path_ops keeps the GIN index much smaller than default jsonb_ops
+        Index(
+            "ix_repair_sympat_gin",
+            "symptom_pattern",
+            postgresql_using="gin",
+            postgresql_ops={"symptom_pattern": "jsonb_path_ops"},
+        ),
+    )
+
     id = Column(Integer, primary_key=True, autoincrement=True)
     
     # Device identification
-    device_model = Column(String(100), nullable=False, index=True)
+    device_model = Column(String(100), nullable=False)
     # Examples: "lenovo_ideapad_5", "dell_xps_15"
     
     # Problem identification
-    issue = Column(String(100), nullable=False, index=True)
+    issue = Column(String(100), nullable=False)
     # Examples: "no_boot", "screen_flicker", "keyboard_malfunction"
     
-    symptom_pattern = Column(JSON, nullable=False)
+    symptom_pattern = Column(JSONB, nullable=False)
     # Binary signals array: {"power_led": true, "caps_lock_toggle": false}
     
     # Diagnosis
@@ -2,123 +2,408 @@
 Adaptive Belief Engine
 Loads base rules + learned patterns, computes belief vectors with skip logic
 """
+import asyncio
+import heapq
 import json
+import operator
+import pickle
+import sys
+import time
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 import asyncpg
+import logging
 import math
 
+log = logging.getLogger(__name__)
+
+try:
+    import ahocorasick  # pyahocorasick - single-pass multi-keyword matching
+except ImportError:
+    ahocorasick = None
+
+# Queries shared by the per-method lookups and the batched bootstrap
+LEARNED_PATTERNS_SQL = """
+    SELECT symptom_combination, cause, confidence, success_rate, support_count
+    FROM learned_patterns
+    WHERE approved = true AND category = $1
+"""
+
+LEARNED_QUESTIONS_SQL = """
+    SELECT question_id, question_text, category, information_gain_avg
+    FROM learned_questions
+    WHERE approved = true AND category = $1
+"""
+
+# Keyword table for semantic belief updates - frozen at module load with
+# interned keywords so per-call lookups hit pointer-equality fast paths
+_SYMPTOM_KEYWORDS = {
+    cause: tuple(sys.intern(kw) for kw in keywords)
+    for cause, keywords in {
+        "driver_issue": ["driver", "software", "update", "install"],
+        "malware": ["virus", "malware", "suspicious", "popup", "slow"],
+        "hardware_failure": ["hardware", "physical", "damaged", "broken"],
+        "display_cable_loose": ["screen", "display", "flicker", "blank"],
+        "gpu_overheating": ["hot", "overheat", "thermal", "fan loud"],
+        "ram_failure": ["memory", "ram", "beep"],
+        "power_supply_failure": ["power", "won't turn on", "dead"],
+        "motherboard_dead": ["motherboard", "no power", "nothing happens"],
+        "os_corruption": ["corrupt", "boot loop", "startup repair"],
+        "thermal_throttling": ["slow", "throttle", "performance drop", "overheat"],
+        "disk_fragmentation": ["slow", "lag", "disk", "storage"],
+        "background_processes": ["background", "startup", "many programs"]
+    }.items()
+}
+
+# Open-ended question templates for uncertain cause pairs, keyed by the
+# unordered pair so generate_text_question resolves them with one lookup
+_TEXT_QUESTION_TEMPLATES = {
+    frozenset(pair): (pair[0], pair[1], text)
+    for pair, text in {
+        ("driver_issue", "malware"): "Have you recently installed any new software, drivers, or updates? Or have you noticed any suspicious behavior?",
+        ("driver_issue", "hardware_failure"): "Does the issue occur in Safe Mode? And have you checked if any hardware components are loose?",
+        ("gpu_overheating", "display_cable_loose"): "Is the screen issue constant or does it come and go? Does the laptop feel hot?",
+        ("power_supply_failure", "motherboard_dead"): "When you press the power button, do you see ANY lights or hear ANY sounds at all?",
+        ("ram_failure", "os_corruption"): "Do you hear any beeping sounds during startup? And does it show any error messages?",
+        ("thermal_throttling", "background_processes"): "Does the slowdown happen immediately or after a few minutes of use? Have you checked Task Manager?",
+    }.items()
+}
+
+
 class BeliefEngine:
     """Manages belief propagation and question selection with adaptive learning"""
-    
+
+    CACHE_TTL = 60.0  # seconds; learned tables are approved-only with rare writes
+
     def __init__(self, db_pool: asyncpg.Pool):
         self.db_pool = db_pool
         self.base_patterns = None
         self.base_questions = None
+        # Per-category caches: {category: (expiry_monotonic, rows)}
+        # Both tables are approved-only reads that change rarely, so a short
+        # TTL plus pg_notify invalidation keeps warm requests off the DB
+        self._lp_cache = {}
+        self._lq_cache = {}
+        self._listen_conn = None
+        # Precompile the keyword table into an Aho-Corasick automaton: one
+        # pass over the answer instead of one scan per keyword. Some
+        # keywords ("slow") map to several causes, so each word carries its
+        # full cause list.
+        self._keyword_automaton = None
+        if ahocorasick is not None:
+            keyword_causes = {}
+            for cause, keywords in _SYMPTOM_KEYWORDS.items():
+                for kw in keywords:
+                    keyword_causes.setdefault(kw, []).append(cause)
+            automaton = ahocorasick.Automaton()
+            for kw, causes in keyword_causes.items():
+                automaton.add_word(kw, (kw, tuple(causes)))
+            automaton.make_automaton()
+            self._keyword_automaton = automaton
         self._load_base_knowledge()
     
+    @staticmethod
+    def _load_json_cached(path: Path):
+        """
+        Load a JSON knowledge file, preferring a pre-parsed pickle cache.
+
+        The cache is written next to the JSON file on first load and reused
+        while it is at least as new as the source, so short-lived workers
+        skip the JSON parse entirely on warm starts.
+        """
+        cache_path = path.with_suffix(".pkl")
+        try:
+            if cache_path.exists() and cache_path.stat().st_mtime >= path.stat().st_mtime:
+                with open(cache_path, "rb") as f:
+                    return pickle.load(f)
+        except Exception as e:
+            log.warning("Ignoring stale/corrupt cache %s: %s", cache_path.name, e)
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        try:
+            with open(cache_path, "wb") as f:
+                pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            log.debug("Could not write knowledge cache %s: %s", cache_path.name, e)
+
+        return data
+
     def _load_base_knowledge(self):
         """Load symptom mappings and questions from JSON files"""
         base_path = Path(__file__).parent
-        
+
         # Load symptom mappings
-        with open(base_path / "symptom_mappings.json", 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            self.base_patterns = data["patterns"]
-        
+        data = self._load_json_cached(base_path / "symptom_mappings.json")
+        self.base_patterns = data["patterns"]
+
+        # Compile patterns into per-category bitmask entries so the scoring
+        # kernel does integer AND + popcount instead of building a set
+        # intersection per pattern. Entries are (mask, symptom_count,
+        # ((cause, weight), ...)) with pattern confidence folded into weight.
+        self._symptom_ids = {}
+        self._base_patterns_by_category = {}
+        for pattern in self.base_patterns:
+            mask = self._symptom_mask(pattern["symptoms"], grow=True)
+            confidence = pattern.get("confidence", 1.0)
+            cause_weights = tuple(
+                (cause, prob * confidence)
+                for cause, prob in pattern["causes"].items()
+            )
+            self._base_patterns_by_category.setdefault(
+                pattern.get("category"), []
+            ).append((mask, len(pattern["symptoms"]), cause_weights))
+
         # Load questions
-        with open(base_path / "questions.json", 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            self.base_questions = {q["id"]: q for q in data["questions"]}
-        
-        print(f"[OK] Loaded {len(self.base_patterns)} base patterns")
-        print(f"[OK] Loaded {len(self.base_questions)} base questions")
-    
+        data = self._load_json_cached(base_path / "questions.json")
+        self.base_questions = {q["id"]: q for q in data["questions"]}
+
+        # Precompile skip_if conditions so should_ask_question doesn't parse
+        # threshold strings or rebuild symptom lists on every candidate
+        for q in self.base_questions.values():
+            # Fill presentation defaults once so select_next_question can
+            # return candidates without a fix-up pass
+            q.setdefault("expected_signal", "behavioral")
+            q.setdefault("cost_level", "safe")
+            skip_conditions = q.get("skip_if", {})
+            threshold_str = skip_conditions.get("brand_confidence")
+            if threshold_str:
+                op = operator.lt if "<" in threshold_str else operator.gt
+                threshold = float(threshold_str.replace(">", "").replace("<", ""))
+                q["_skip_brand_conf"] = (op, threshold)
+            for key in ("symptom_present", "symptom_not_present", "visual_symptoms_detected"):
+                if key in skip_conditions:
+                    q["_skip_" + key] = frozenset(skip_conditions[key])
+
+        # Index questions by category and by the causes their answers touch,
+        # so selection iterates only the relevant bucket and the relevance
+        # check is a single set operation
+        self._questions_by_category = {}
+        self._question_affects_causes = {}
+        for q_id, q in self.base_questions.items():
+            self._questions_by_category.setdefault(q.get("category"), []).append(q)
+            affected = set()
+            for updates in q.get("belief_updates", {}).values():
+                affected.update(updates.keys())
+            self._question_affects_causes[q_id] = frozenset(affected)
+
+        log.info("Loaded %d base patterns", len(self.base_patterns))
+        log.info("Loaded %d base questions", len(self.base_questions))
+
+    @staticmethod
+    def _normalize(beliefs: Dict[str, float]) -> None:
+        """Renormalize a belief vector in place (fsum for stability - the
+        multiplicative updates can make magnitudes large)"""
+        total = math.fsum(beliefs.values())
+        if total > 0:
+            inv = 1.0 / total
+            for cause in beliefs:
+                beliefs[cause] *= inv
+
+    def _symptom_mask(self, symptoms, grow: bool = False) -> int:
+        """
+        Map a symptom collection to a bitmask over the shared symptom
+        vocabulary. With grow=True unseen symptoms get new bits (used when
+        compiling patterns); otherwise they are dropped, since a symptom no
+        pattern mentions can never contribute to an overlap.
+        """
+        ids = self._symptom_ids
+        mask = 0
+        if grow:
+            for symptom in symptoms:
+                mask |= 1 << ids.setdefault(symptom, len(ids))
+        else:
+            for symptom in symptoms:
+                bit = ids.get(symptom)
+                if bit is not None:
+                    mask |= 1 << bit
+        return mask
+
+    @staticmethod
+    def _score_patterns(entries, qmask: int, weight: float, beliefs: Dict[str, float]) -> int:
+        """
+        Inner pattern-scoring kernel shared by the base and learned passes.
+
+        Overlap is one AND + popcount per pattern; per-pattern factors are
+        pre-folded into cause weights, so only the overlap ratio and the
+        pass weight are applied here. Returns the number of matches.
+        """
+        matched = 0
+        for mask, symptom_count, cause_weights in entries:
+            overlap = (mask & qmask).bit_count()
+            if overlap:
+                matched += 1
+                scale = weight * overlap / symptom_count
+                for cause, w in cause_weights:
+                    beliefs[cause] = beliefs.get(cause, 0.0) + scale * w
+        return matched
+
+    @staticmethod
+    def _cache_get(cache: Dict, category: str):
+        entry = cache.get(category)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    async def _get_learned_patterns(self, category: str, conn: Optional[asyncpg.Connection] = None):
+        """Fetch approved learned patterns for a category (cached, 60s TTL)"""
+        cached = self._cache_get(self._lp_cache, category)
+        if cached is not None:
+            return cached
+        rows = await (conn or self.db_pool).fetch(LEARNED_PATTERNS_SQL, category)
+        return self._fill_lp_cache(category, rows)
+
+    async def _get_learned_questions(self, category: str, conn: Optional[asyncpg.Connection] = None):
+        """Fetch approved learned questions for a category (cached, 60s TTL)"""
+        cached = self._cache_get(self._lq_cache, category)
+        if cached is not None:
+            return cached
+        rows = await (conn or self.db_pool).fetch(LEARNED_QUESTIONS_SQL, category)
+        return self._fill_lq_cache(category, rows)
+
+    def _fill_lp_cache(self, category: str, rows):
+        # Compile records into the same (mask, count, cause_weights) shape
+        # the base patterns use, with the confidence-weighted fusion term
+        # w(π) = r(π) · (1 - exp(-n(π)/n₀)) pre-folded per row
+        n0 = 5  # Temperature parameter
+        patterns = []
+        for r in rows:
+            combo = r["symptom_combination"]
+            w = r["success_rate"] * (1 - math.exp(-r["support_count"] / n0))
+            patterns.append((
+                self._symptom_mask(combo, grow=True),
+                len(combo),
+                ((r["cause"], w),),
+            ))
+        self._lp_cache[category] = (time.monotonic() + self.CACHE_TTL, patterns)
+        return patterns
+
+    def _fill_lq_cache(self, category: str, rows):
+        questions = [
+            {
+                "id": r["question_id"],
+                "text": r["question_text"],
+                "category": r["category"],
+                "information_gain_estimate": r["information_gain_avg"],  # Use avg as estimate
+                "source": "learned",
+                "expected_signal": "behavioral",
+                "cost_level": "safe"
+            }
+            for r in rows
+        ]
+        self._lq_cache[category] = (time.monotonic() + self.CACHE_TTL, questions)
+        return questions
+
+    def _bust_cache(self, conn, pid, channel, payload):
+        """pg_notify callback - drop cached rows for the changed category"""
+        cache = self._lp_cache if channel == "learned_patterns_changed" else self._lq_cache
+        if payload:
+            cache.pop(payload, None)
+        else:
+            cache.clear()
+
+    async def start_cache_invalidation(self):
+        """
+        Listen for learned_patterns/learned_questions changes via pg_notify
+        (triggers are created in schema_learning.sql) so cached rows are
+        dropped as soon as a pattern or question is approved or edited.
+        """
+        if self._listen_conn is not None:
+            return
+        self._listen_conn = await self.db_pool.acquire()
+        await self._listen_conn.add_listener("learned_patterns_changed", self._bust_cache)
+        await self._listen_conn.add_listener("learned_questions_changed", self._bust_cache)
+
+    async def bootstrap(self, category: str):
+        """
+        Prefetch learned patterns + learned questions for a category in a
+        single round-trip instead of one RTT per lookup.
+
+        Prefers the diagnostic_bootstrap() SQL function (one query, one
+        plan - see schema_learning.sql); falls back to two concurrent
+        fetches when the function hasn't been created yet.
+
+        Call once at the start of a diagnostic session; initialize_beliefs
+        and select_next_question then hit the warm cache.
+        """
+        if (self._cache_get(self._lp_cache, category) is not None
+                and self._cache_get(self._lq_cache, category) is not None):
+            return
+        try:
+            rows = await self.db_pool.fetch(
+                "SELECT kind, payload FROM diagnostic_bootstrap($1)", category
+            )
+        except asyncpg.UndefinedFunctionError:
+            lp_rows, lq_rows = await asyncio.gather(
+                self.db_pool.fetch(LEARNED_PATTERNS_SQL, category),
+                self.db_pool.fetch(LEARNED_QUESTIONS_SQL, category)
+            )
+            self._fill_lp_cache(category, lp_rows)
+            self._fill_lq_cache(category, lq_rows)
+            return
+
+        lp_rows = []
+        lq_rows = []
+        for row in rows:
+            payload = row["payload"]
+            if isinstance(payload, str):  # no jsonb codec registered
+                payload = json.loads(payload)
+            (lp_rows if row["kind"] == "lp" else lq_rows).append(payload)
+        self._fill_lp_cache(category, lp_rows)
+        self._fill_lq_cache(category, lq_rows)
+
     async def initialize_beliefs(
         self, 
         symptoms: List[str], 
         visual_symptoms: List[str],
         category: str,
-        brand: Optional[str] = None
+        brand: Optional[str] = None,
+        conn: Optional[asyncpg.Connection] = None
     ) -> Dict[str, float]:
         """
         Initialize belief vector from symptoms
         Combines base patterns + learned patterns with confidence weighting
-        
+
+        Pass conn to reuse a request-scoped connection instead of hitting
+        the pool for this call alone.
+
         Returns: belief_vector = {"cause": probability, ...}
         """
-        print(f"[DEBUG] Initializing beliefs with symptoms: {symptoms}")
-        print(f"[DEBUG] Total base patterns loaded: {len(self.base_patterns)}")
+        debug = log.isEnabledFor(logging.DEBUG)
+        if debug:
+            log.debug("Initializing beliefs with symptoms: %s", symptoms)
+            log.debug("Total base patterns loaded: %d", len(self.base_patterns))
         
         beliefs = {}
         
         all_symptoms = set(symptoms + visual_symptoms)
-        print(f"[DEBUG] All symptoms (combined): {all_symptoms}")
+        if debug:
+            log.debug("All symptoms (combined): %s", all_symptoms)
         
-        # Step 1: Load base patterns
         alpha = 0.7  # Base knowledge weight (will decay over time as system learns)
-        
-        matched_patterns = 0
-        for pattern in self.base_patterns:
-            # Check category match
-            if pattern.get("category") != category:
-                continue
-            
-            # Calculate symptom overlap
-            pattern_symptoms = set(pattern["symptoms"])
-            overlap = pattern_symptoms & all_symptoms
-            
-            if overlap:
-                matched_patterns += 1
-                print(f"[DEBUG] Pattern matched: {pattern['symptoms']} -> {list(pattern['causes'].keys())}")
-                overlap_ratio = len(overlap) / len(pattern_symptoms)
-                pattern_confidence = pattern.get("confidence", 1.0)
-                
-                for cause, prob in pattern["causes"].items():
-                    if cause not in beliefs:
-                        beliefs[cause] = 0.0
-                    beliefs[cause] += alpha * prob * overlap_ratio * pattern_confidence
-        
-        print(f"[DEBUG] Matched {matched_patterns} patterns from base knowledge")
-        print(f"[DEBUG] Beliefs after base patterns: {dict(list(beliefs.items())[:3])}")
-        
-        # Step 2: Load learned patterns from database
         learned_weight = 1.0 - alpha
-        
-        async with self.db_pool.acquire() as conn:
-            learned_patterns = await conn.fetch("""
-                SELECT symptom_combination, cause, confidence, success_rate, support_count
-                FROM learned_patterns
-                WHERE approved = true AND category = $1
-            """, category)
-            
-            for lp in learned_patterns:
-                pattern_symptoms = set(lp["symptom_combination"])
-                overlap = pattern_symptoms & all_symptoms
-                
-                if overlap:
-                    overlap_ratio = len(overlap) / len(pattern_symptoms)
-                    
-                    # Confidence-weighted belief fusion
-                    # w(π) = r(π) · (1 - exp(-n(π)/n₀))
-                    n = lp["support_count"]
-                    r = lp["success_rate"]
-                    n0 = 5  # Temperature parameter
-                    w = r * (1 - math.exp(-n / n0))
-                    
-                    cause = lp["cause"]
-                    if cause not in beliefs:
-                        beliefs[cause] = 0.0
-                    beliefs[cause] += learned_weight * w * overlap_ratio
-        
-        # Step 3: Normalize belief vector
-        total = sum(beliefs.values())
-        if total > 0:
-            beliefs = {k: v / total for k, v in beliefs.items()}
-        
-        # Step 4: Sort by confidence
-        beliefs = dict(sorted(beliefs.items(), key=lambda x: x[1], reverse=True))
-        
+
+        # Fetch learned patterns first: compiling them may grow the symptom
+        # vocabulary, and the query mask must be built against the final one
+        learned_patterns = await self._get_learned_patterns(category, conn)
+        qmask = self._symptom_mask(all_symptoms)
+
+        # Step 1: Score base patterns (pre-bucketed by category)
+        matched_patterns = self._score_patterns(
+            self._base_patterns_by_category.get(category, ()), qmask, alpha, beliefs
+        )
+
+        if debug:
+            log.debug("Matched %d patterns from base knowledge", matched_patterns)
+            log.debug("Beliefs after base patterns: %s", dict(list(beliefs.items())[:3]))
+
+        # Step 2: Score learned patterns from database
+        self._score_patterns(learned_patterns, qmask, learned_weight, beliefs)
+
+        # Step 3: Normalize belief vector in place
+        self._normalize(beliefs)
+
         return beliefs
     
     async def update_beliefs_semantic(
@@ -132,40 +417,35 @@ class BeliefEngine:
         Update beliefs based on semantic analysis of text response
         Uses keyword extraction and intent matching
         """
-        print(f"\n🔍 SEMANTIC BELIEF UPDATE")
-        print(f"   Question: {question_text[:80]}...")
-        print(f"   Answer: {answer_text[:80]}...")
+        debug = log.isEnabledFor(logging.DEBUG)
+        if debug:
+            log.debug("Semantic belief update - question: %s | answer: %s",
+                      question_text[:80], answer_text[:80])
         
         # Extract keywords and symptoms from answer
         answer_lower = answer_text.lower()
         detected_symptoms = []
-        
-        # Check symptom keywords from processor
-        symptom_keywords = {
-            "driver_issue": ["driver", "software", "update", "install"],
-            "malware": ["virus", "malware", "suspicious", "popup", "slow"],
-            "hardware_failure": ["hardware", "physical", "damaged", "broken"],
-            "display_cable_loose": ["screen", "display", "flicker", "blank"],
-            "gpu_overheating": ["hot", "overheat", "thermal", "fan loud"],
-            "ram_failure": ["memory", "ram", "beep"],
-            "power_supply_failure": ["power", "won't turn on", "dead"],
-            "motherboard_dead": ["motherboard", "no power", "nothing happens"],
-            "os_corruption": ["corrupt", "boot loop", "startup repair"],
-            "thermal_throttling": ["slow", "throttle", "performance drop", "overheat"],
-            "disk_fragmentation": ["slow", "lag", "disk", "storage"],
-            "background_processes": ["background", "startup", "many programs"]
-        }
-        
-        # Score each cause based on keyword matches
+
+        # Score each cause based on keyword matches - single automaton pass
+        # when pyahocorasick is available, per-keyword scan otherwise
         keyword_scores = {}
-        for cause, keywords in symptom_keywords.items():
-            score = sum(1 for kw in keywords if kw in answer_lower)
-            if score > 0:
-                keyword_scores[cause] = score
-                detected_symptoms.extend([kw for kw in keywords if kw in answer_lower])
+        if self._keyword_automaton is not None:
+            matched = set()
+            for _, payload in self._keyword_automaton.iter(answer_lower):
+                matched.add(payload)
+            for kw, causes in matched:
+                detected_symptoms.append(kw)
+                for cause in causes:
+                    keyword_scores[cause] = keyword_scores.get(cause, 0) + 1
+        else:
+            for cause, keywords in _SYMPTOM_KEYWORDS.items():
+                score = sum(1 for kw in keywords if kw in answer_lower)
+                if score > 0:
+                    keyword_scores[cause] = score
+                    detected_symptoms.extend([kw for kw in keywords if kw in answer_lower])
         
-        print(f"   Detected keywords: {detected_symptoms[:5]}")
-        print(f"   Keyword scores: {keyword_scores}")
+        if debug:
+            log.debug("Detected keywords: %s | scores: %s", detected_symptoms[:5], keyword_scores)
         
         # Apply semantic updates
         if keyword_scores:
@@ -175,20 +455,18 @@ class BeliefEngine:
                     multiplier = 1.0 + (score * 0.5)  # +50% per keyword match
                     old_val = current_beliefs[cause]
                     current_beliefs[cause] *= multiplier
-                    print(f"   {cause}: {old_val:.3f} → {current_beliefs[cause]:.3f} (×{multiplier:.2f})")
+                    if debug:
+                        log.debug("%s: %.3f -> %.3f (x%.2f)", cause, old_val, current_beliefs[cause], multiplier)
                 elif score >= 2:  # Strong match, add to beliefs
                     current_beliefs[cause] = 0.1 * score
-                    print(f"   {cause}: NEW → {current_beliefs[cause]:.3f}")
-            
-            # Normalize
-            total = sum(current_beliefs.values())
-            if total > 0:
-                current_beliefs = {k: v / total for k, v in current_beliefs.items()}
+                    if debug:
+                        log.debug("%s: NEW -> %.3f", cause, current_beliefs[cause])
             
-            # Sort
-            current_beliefs = dict(sorted(current_beliefs.items(), key=lambda x: x[1], reverse=True))
+            # Normalize in place
+            self._normalize(current_beliefs)
         else:
-            print(f"   ⚠️ No semantic matches found - beliefs unchanged")
+            if debug:
+                log.debug("No semantic matches found - beliefs unchanged")
         
         return current_beliefs
     
@@ -196,7 +474,8 @@ class BeliefEngine:
         self,
         current_beliefs: Dict[str, float],
         question_id: str,
-        answer: str
+        answer: str,
+        conn: Optional[asyncpg.Connection] = None
     ) -> Dict[str, float]:
         """
         Update belief vector based on question answer
@@ -206,31 +485,31 @@ class BeliefEngine:
         """
         question = self.base_questions.get(question_id)
         if not question:
-            print(f"⚠️ WARNING: Question '{question_id}' not found in base questions!")
-            print(f"   Available questions: {list(self.base_questions.keys())[:10]}...")
+            log.warning("Question '%s' not found in base questions", question_id)
             # Check if it's a learned question from DB
-            async with self.db_pool.acquire() as conn:
-                learned_q = await conn.fetchrow("""
-                    SELECT question_id, belief_updates_json
-                    FROM learned_questions
-                    WHERE question_id = $1 AND approved = true
-                """, question_id)
-                
-                if learned_q and learned_q["belief_updates_json"]:
-                    print(f"✓ Found as learned question - using stored belief updates")
-                    updates = learned_q["belief_updates_json"].get(answer, {})
-                else:
-                    print(f"✗ Question not found in learned questions either - returning unchanged beliefs")
-                    return current_beliefs
+            learned_q = await (conn or self.db_pool).fetchrow("""
+                SELECT question_id, belief_updates_json
+                FROM learned_questions
+                WHERE question_id = $1 AND approved = true
+            """, question_id)
+
+            if learned_q and learned_q["belief_updates_json"]:
+                log.debug("Found '%s' as learned question - using stored belief updates", question_id)
+                updates = learned_q["belief_updates_json"].get(answer, {})
+            else:
+                log.warning("Question '%s' not found in learned questions either - returning unchanged beliefs", question_id)
+                return current_beliefs
         else:
             # Get update rules from base question
             updates = question.get("belief_updates", {}).get(answer, {})
         
         if not updates:
-            print(f"⚠️ No belief updates found for answer '{answer}' to question '{question_id}'")
+            log.debug("No belief updates found for answer '%s' to question '%s'", answer, question_id)
             return current_beliefs
         
-        print(f"📊 Applying {len(updates)} belief updates for answer '{answer}':")
+        debug = log.isEnabledFor(logging.DEBUG)
+        if debug:
+            log.debug("Applying %d belief updates for answer '%s'", len(updates), answer)
         # Apply updates
         for cause, multiplier in updates.items():
             old_value = current_beliefs.get(cause, 0.0)
@@ -238,16 +517,12 @@ class BeliefEngine:
                 if isinstance(multiplier, str) and multiplier.startswith("*"):
                     factor = float(multiplier[1:])
                     current_beliefs[cause] *= factor
-                    print(f"   {cause}: {old_value:.3f} → {current_beliefs[cause]:.3f} (×{factor})")
-        
-        # Normalize
-        total = sum(current_beliefs.values())
-        if total > 0:
-            current_beliefs = {k: v / total for k, v in current_beliefs.items()}
-        
-        # Sort
-        current_beliefs = dict(sorted(current_beliefs.items(), key=lambda x: x[1], reverse=True))
+                    if debug:
+                        log.debug("%s: %.3f -> %.3f (x%s)", cause, old_value, current_beliefs[cause], factor)
         
+        # Normalize in place - no intermediate dict allocations
+        self._normalize(current_beliefs)
+
         return current_beliefs
     
     def should_ask_question(
@@ -272,40 +547,31 @@ class BeliefEngine:
         if question_id in asked_questions:
             return False, "Already asked"
         
-        skip_conditions = question.get("skip_if", {})
-        
-        # Criterion 1: Redundancy check
+        # Criterion 1: Redundancy check (conditions precompiled at load time)
         # Skip if brand already known with high confidence
-        if "brand_confidence" in skip_conditions:
-            threshold_str = skip_conditions["brand_confidence"]
-            threshold = float(threshold_str.replace(">", "").replace("<", ""))
+        brand_check = question.get("_skip_brand_conf")
+        if brand_check:
+            op, threshold = brand_check
             brand_conf = processed_input.get("brand_confidence", 0.0)
-            
-            if ">" in threshold_str and brand_conf > threshold:
+            if op(brand_conf, threshold):
                 return False, f"Brand already known (confidence: {brand_conf:.2f})"
-        
+
+        detected_symptoms = (frozenset(processed_input.get("symptoms", []))
+                             | frozenset(processed_input.get("visual_symptoms", [])))
+
         # Skip if symptom already detected
-        if "symptom_present" in skip_conditions:
-            required_symptoms = skip_conditions["symptom_present"]
-            detected_symptoms = processed_input.get("symptoms", []) + processed_input.get("visual_symptoms", [])
-            
-            if any(s in detected_symptoms for s in required_symptoms):
-                return False, "Symptom already detected from input"
-        
-        if "symptom_not_present" in skip_conditions:
-            required_symptoms = skip_conditions["symptom_not_present"]
-            detected_symptoms = processed_input.get("symptoms", []) + processed_input.get("visual_symptoms", [])
-            
-            if not any(s in detected_symptoms for s in required_symptoms):
-                return False, "Question not relevant to detected symptoms"
-        
+        required_symptoms = question.get("_skip_symptom_present")
+        if required_symptoms is not None and not required_symptoms.isdisjoint(detected_symptoms):
+            return False, "Symptom already detected from input"
+
+        required_symptoms = question.get("_skip_symptom_not_present")
+        if required_symptoms is not None and required_symptoms.isdisjoint(detected_symptoms):
+            return False, "Question not relevant to detected symptoms"
+
         # Skip if visual symptom already answered question
-        if "visual_symptoms_detected" in skip_conditions:
-            required = skip_conditions["visual_symptoms_detected"]
-            visual = processed_input.get("visual_symptoms", [])
-            
-            if any(v in visual for v in required):
-                return False, "Visual analysis already provided this information"
+        required = question.get("_skip_visual_symptoms_detected")
+        if required is not None and not required.isdisjoint(processed_input.get("visual_symptoms", [])):
+            return False, "Visual analysis already provided this information"
         
         # Criterion 2: Low expected gain
         # Skip if information gain estimate is below threshold
@@ -314,18 +580,9 @@ class BeliefEngine:
             return False, f"Low information gain ({ig_estimate:.2f})"
         
         # Criterion 3: Irrelevance check
-        # Skip if question doesn't help distinguish between top causes
-        # Check if any of the top-3 causes are affected by this question
-        top_causes = list(current_beliefs.keys())[:3]
-        question_affects_top_causes = False
-        
-        for answer_key in question.get("belief_updates", {}).keys():
-            updates = question["belief_updates"][answer_key]
-            if any(cause in top_causes for cause in updates.keys()):
-                question_affects_top_causes = True
-                break
-        
-        if not question_affects_top_causes:
+        # Skip if question doesn't touch any of the top-3 causes
+        affected_causes = self._question_affects_causes.get(question_id, frozenset())
+        if affected_causes.isdisjoint(self.top_k(current_beliefs, 3)):
             return False, "Question doesn't help distinguish top causes"
         
         # Check if any top cause probability is too low to matter
@@ -340,7 +597,8 @@ class BeliefEngine:
         current_beliefs: Dict[str, float],
         processed_input: Dict,
         asked_questions: List[str],
-        category: str
+        category: str,
+        conn: Optional[asyncpg.Connection] = None
     ) -> Optional[Dict]:
         """
         Select next question using information-theoretic approach
@@ -348,29 +606,18 @@ class BeliefEngine:
         
         Returns: question dict or None if no more questions
         """
-        # Get candidate questions for this category
+        # Get candidate questions for this category (preindexed at load)
         candidate_questions = [
-            q for q_id, q in self.base_questions.items()
-            if q.get("category") == category and q_id not in asked_questions
+            q for q in self._questions_by_category.get(category, [])
+            if q["id"] not in asked_questions
         ]
         
-        # Also load learned questions
-        async with self.db_pool.acquire() as conn:
-            learned_q = await conn.fetch("""
-                SELECT question_id, question_text, category, information_gain_avg
-                FROM learned_questions
-                WHERE approved = true AND category = $1
-            """, category)
-            
-            for lq in learned_q:
-                if lq["question_id"] not in asked_questions:
-                    candidate_questions.append({
-                        "id": lq["question_id"],
-                        "text": lq["question_text"],
-                        "category": lq["category"],
-                        "information_gain_estimate": lq["information_gain_avg"],  # Use avg as estimate
-                        "source": "learned"
-                    })
+        # Also load learned questions (already shaped as question dicts by the cache)
+        learned_q = await self._get_learned_questions(category, conn)
+
+        for lq in learned_q:
+            if lq["id"] not in asked_questions:
+                candidate_questions.append(lq)
         
         if not candidate_questions:
             return None
@@ -390,21 +637,23 @@ class BeliefEngine:
         # Select question with highest information gain estimate
         best_question = max(valid_questions, key=lambda q: q.get("information_gain_estimate", 0.5))
         
-        print(f"✅ Selected question ID: '{best_question['id']}' with gain {best_question.get('information_gain_estimate', 0.5):.2f}")
-        print(f"   Question text: {best_question.get('text', 'N/A')}")
-        
-        # Ensure all required fields are present
-        if "expected_signal" not in best_question and best_question["id"] in self.base_questions:
-            # Fill from base question
-            base_q = self.base_questions[best_question["id"]]
-            best_question["expected_signal"] = base_q.get("expected_signal", "behavioral")
-            best_question["cost_level"] = base_q.get("cost_level", "safe")
-        
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Selected question '%s' with gain %.2f: %s",
+                      best_question['id'],
+                      best_question.get('information_gain_estimate', 0.5),
+                      best_question.get('text', 'N/A'))
+
+        # expected_signal/cost_level defaults were applied at load time
         return best_question
     
     def get_confidence(self, beliefs: Dict[str, float]) -> float:
         """Get maximum confidence from belief vector"""
         return max(beliefs.values()) if beliefs else 0.0
+
+    @staticmethod
+    def top_k(beliefs: Dict[str, float], k: int) -> List[str]:
+        """Top-k causes by probability - O(N) heap select, no full sort"""
+        return [cause for cause, _ in heapq.nlargest(k, beliefs.items(), key=lambda x: x[1])]
     
     def generate_text_question(self, current_beliefs: Dict[str, float], asked_questions: List[str]) -> Optional[Dict]:
         """
@@ -424,40 +673,30 @@ class BeliefEngine:
                 }
             return None
         
-        # Get top 3 causes with similar probabilities (uncertain area)
-        sorted_beliefs = sorted(current_beliefs.items(), key=lambda x: x[1], reverse=True)
-        
-        top_cause, top_prob = sorted_beliefs[0]
-        second_cause, second_prob = sorted_beliefs[1] if len(sorted_beliefs) > 1 else (None, 0)
+        # Get top 2 causes with similar probabilities (uncertain area)
+        top_beliefs = heapq.nlargest(2, current_beliefs.items(), key=lambda x: x[1])
+
+        top_cause, top_prob = top_beliefs[0]
+        second_cause, second_prob = top_beliefs[1] if len(top_beliefs) > 1 else (None, 0)
         
         # If very confident, no need for more questions
         if top_prob > 0.75:
             return None
         
-        # Generate questions based on cause comparison
-        question_templates = {
-            ("driver_issue", "malware"): "Have you recently installed any new software, drivers, or updates? Or have you noticed any suspicious behavior?",
-            ("driver_issue", "hardware_failure"): "Does the issue occur in Safe Mode? And have you checked if any hardware components are loose?",
-            ("gpu_overheating", "display_cable_loose"): "Is the screen issue constant or does it come and go? Does the laptop feel hot?",
-            ("power_supply_failure", "motherboard_dead"): "When you press the power button, do you see ANY lights or hear ANY sounds at all?",
-            ("ram_failure", "os_corruption"): "Do you hear any beeping sounds during startup? And does it show any error messages?",
-            ("thermal_throttling", "background_processes"): "Does the slowdown happen immediately or after a few minutes of use? Have you checked Task Manager?",
-        }
-        
-        # Find matching template
-        for (cause1, cause2), question in question_templates.items():
-            if (top_cause == cause1 and second_cause == cause2) or \
-               (top_cause == cause2 and second_cause == cause1):
-                question_id = f"text_{cause1}_{cause2}"
-                if question_id not in asked_questions:
-                    return {
-                        "id": question_id,
-                        "text": question,
-                        "expected_signal": "text",
-                        "cost_level": "safe",
-                        "information_gain_estimate": 0.85,
-                        "response_type": "text"
-                    }
+        # Find matching template - O(1) lookup on the unordered cause pair
+        template = _TEXT_QUESTION_TEMPLATES.get(frozenset((top_cause, second_cause)))
+        if template:
+            cause1, cause2, question = template
+            question_id = f"text_{cause1}_{cause2}"
+            if question_id not in asked_questions:
+                return {
+                    "id": question_id,
+                    "text": question,
+                    "expected_signal": "text",
+                    "cost_level": "safe",
+                    "information_gain_estimate": 0.85,
+                    "response_type": "text"
+                }
         
         # Fallback: general clarification question
         general_id = f"text_general_{len(asked_questions)}"
@@ -3,13 +3,103 @@ Knowledge-Based ML Diagnosis Engine
 Learns from extracted manual data and provides real solutions
 """
 
+import hashlib
 import json
 import numpy as np
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
 from sentence_transformers import SentenceTransformer
 from pathlib import Path
 from .smart_question_generator import SmartQuestionGenerator
 
+try:
+    import simsimd  # hand-tuned SIMD cosine kernels (AVX-512/NEON)
+except ImportError:
+    simsimd = None
+
+try:
+    import hnswlib  # approximate nearest-neighbor index for large KBs
+except ImportError:
+    hnswlib = None
+
+
+def _confidence_numeric(
+    similarity: float,
+    keyword_matches: int,
+    answer_count: int,
+    detailed_count: int
+) -> float:
+    """Pure numeric confidence core - no string or dict work
+
+    Kept as a free function of four scalars so the per-candidate cost in
+    diagnose is plain arithmetic; the wrapper extracts the counts.
+    """
+    # Start with higher base confidence (75% of similarity instead of 60%)
+    confidence = similarity * 0.75
+
+    # More aggressive keyword bonus (0.08 per match, up to 0.24)
+    confidence += min(keyword_matches * 0.08, 0.24)
+
+    # Progressive bonus for each answer (not just >2)
+    # 1 answer: +5%, 2 answers: +10%, 3+ answers: +15%
+    if answer_count == 1:
+        confidence += 0.05
+    elif answer_count == 2:
+        confidence += 0.10
+    elif answer_count >= 3:
+        confidence += 0.15
+
+    # Extra bonus for detailed answers (>20 words)
+    confidence += 0.05 * detailed_count
+
+    # Cap at 0.95
+    return min(confidence, 0.95)
+
+
+class _OnnxMiniLMEncoder:
+    """encode()-compatible wrapper around an ONNX-exported MiniLM
+
+    Covers the subset of the SentenceTransformer API this module uses:
+    encode() on a string or list of strings, masked mean pooling,
+    optional normalization. ONNX Runtime fuses the attention kernels,
+    which makes CPU encode several times faster than eager PyTorch.
+    """
+
+    def __init__(self, model_name: str, export_dir: Path):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        if (export_dir / "model.onnx").exists():
+            self.model = ORTModelForFeatureExtraction.from_pretrained(export_dir)
+        else:
+            # One-time export; later startups load the saved graph
+            self.model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+            self.model.save_pretrained(export_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True,
+               normalize_embeddings=False, show_progress_bar=False, **kwargs):
+        single = isinstance(sentences, str)
+        batch = [sentences] if single else list(sentences)
+
+        chunks = []
+        for start in range(0, len(batch), batch_size):
+            inputs = self.tokenizer(
+                batch[start:start + batch_size],
+                padding=True, truncation=True, return_tensors="pt"
+            )
+            outputs = self.model(**inputs)
+            # Masked mean pooling over token embeddings
+            mask = inputs["attention_mask"].unsqueeze(-1)
+            pooled = (outputs.last_hidden_state * mask).sum(1) / mask.sum(1).clamp(min=1)
+            chunks.append(pooled.detach().cpu().numpy())
+
+        embeddings = np.concatenate(chunks, axis=0)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings[0] if single else embeddings
+
 
 class KnowledgeBasedDiagnosisEngine:
     """
@@ -25,14 +115,70 @@ class KnowledgeBasedDiagnosisEngine:
         # Load sentence transformer for semantic matching
         print("  Loading sentence transformer model...")
         import os
+        import torch
+
+        # Tune Torch for single-query CPU inference before loading the
+        # model: capped intra-op threads avoid contention on many-core
+        # hosts, and inter-op parallelism buys nothing for one encode
+        torch.set_num_threads(min(os.cpu_count() or 1, 8))
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # only settable before the first parallel op
+
         cache_dir = os.getenv("TRANSFORMERS_CACHE", "E:\\z.code\\arvr\\.cache")
-        self.model = SentenceTransformer('all-MiniLM-L6-v2', cache_folder=cache_dir)
+        # Smaller corpora tolerate a lighter model well - e.g.
+        # KNOWLEDGE_ENGINE_MODEL=paraphrase-MiniLM-L3-v2 roughly halves
+        # encode time at comparable STS quality
+        self.model_name = os.getenv("KNOWLEDGE_ENGINE_MODEL", "all-MiniLM-L6-v2")
+        self.model = SentenceTransformer(self.model_name, cache_folder=cache_dir).eval()
+
+        # Optional dynamic int8 quantization of the Linear layers
+        # (~2x CPU encode at a small recall cost)
+        if bool(int(os.getenv("KNOWLEDGE_ENGINE_QINT8", "0"))):
+            self.model = torch.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            print("  ✓ Dynamic int8 quantization applied")
         print("  ✓ Model loaded")
+
+        # Opt-in ONNX Runtime backend for encode (KNOWLEDGE_ENGINE_ONNX=1)
+        if bool(int(os.getenv("KNOWLEDGE_ENGINE_ONNX", "0"))):
+            try:
+                hub_name = self.model_name if '/' in self.model_name \
+                    else f'sentence-transformers/{self.model_name}'
+                self.model = _OnnxMiniLMEncoder(
+                    hub_name,
+                    Path(cache_dir) / 'onnx' / self.model_name.replace('/', '_')
+                )
+                print("  ✓ ONNX Runtime encoder active")
+            except ImportError:
+                print("  ⚠ optimum[onnxruntime] not installed, keeping PyTorch encoder")
+
+        # Opt-in int8 embeddings: 4x less memory traffic on the similarity
+        # scan, needs the SimSIMD i8 kernel (float32 stays the default)
+        self.use_int8 = simsimd is not None and bool(int(os.getenv("KNOWLEDGE_EMB_INT8", "0")))
+
+        # Per-request diagnostic prints serialize on stdout under load;
+        # keep them opt-in (startup messages still print unconditionally)
+        self.verbose = bool(int(os.getenv("DIAG_VERBOSE", "0")))
         
         # Initialize smart question generator
         self.question_generator = SmartQuestionGenerator(self.model)
         print("  ✓ Smart question generator initialized")
         
+        # LRU cache over encoded texts - multi-turn dialogues re-embed
+        # near-identical strings, and the forward pass dominates latency
+        self._embed_cache = OrderedDict()
+
+        # Worker pool for bulk embedding, created on first diagnose_batch
+        self._mp_pool = None
+
+        # Running per-session symptom embeddings, keyed by the initial
+        # symptom text, so follow-up answers update the query vector
+        # without re-encoding the whole transcript each turn
+        self._session_embeddings = OrderedDict()
+
         # Load knowledge base from extracted manuals
         self.knowledge_base = self._load_knowledge_base(knowledge_base_path)
         print(f"  ✓ Loaded {len(self.knowledge_base)} procedures from manuals")
@@ -41,35 +187,102 @@ class KnowledgeBasedDiagnosisEngine:
         print("  Computing embeddings for procedures...")
         self._build_procedure_embeddings()
         print("  ✓ Embeddings ready")
-        
+
+        # Warm-up forward pass: first-touch costs (kernel selection, MKL
+        # init, allocator growth) land here instead of on the first user
+        self.model.encode("warmup text", convert_to_numpy=True)
+
         print("✓ Engine ready!")
     
     def _load_knowledge_base(self, path: str) -> List[Dict]:
         """Load extracted knowledge from JSON"""
         
         kb_path = Path(path)
+        self._emb_cache_path = None
         if not kb_path.exists():
             print(f"⚠ Knowledge base not found: {path}")
             print("  Run manual_extractor.py first to extract data from PDFs")
             return []
         
-        with open(kb_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        raw = kb_path.read_bytes()
+        # Content hash keys the on-disk embedding cache: any KB edit
+        # changes the name, so stale embeddings are never picked up
+        kb_hash = hashlib.sha256(raw).hexdigest()[:16]
+        model_tag = self.model_name.replace('/', '_')
+        self._emb_cache_path = kb_path.with_name(
+            f"{kb_path.name}.{kb_hash}.{model_tag}.emb.npy"
+        )
+        data = json.loads(raw)
+
+        # Derive per-procedure strings once at load: the keyword token set
+        # keeps matching a hash intersection, and the embedding text saves
+        # re-joining symptoms whenever embeddings are (re)built
+        for proc in data:
+            proc['_kw_set'] = frozenset(proc['issue_type'].lower().split('_'))
+            proc['_embed_text'] = f"{proc['issue_type']} {' '.join(proc.get('symptoms', []))}"
+        return data
     
     def _build_procedure_embeddings(self):
         """Pre-compute embeddings for all procedures"""
         
-        self.procedure_embeddings = []
-        
-        for proc in self.knowledge_base:
-            # Combine symptoms and issue type for embedding
-            text_to_embed = f"{proc['issue_type']} {' '.join(proc.get('symptoms', []))}"
-            
-            embedding = self.model.encode(text_to_embed)
-            self.procedure_embeddings.append(embedding)
-        
-        if self.procedure_embeddings:
-            self.procedure_embeddings = np.array(self.procedure_embeddings)
+        self.procedure_embeddings = np.array([])
+        self.proc_emb_i8 = None
+        self._hnsw = None
+
+        if not self.knowledge_base:
+            return
+
+        cache_path = self._emb_cache_path
+        if cache_path is not None and cache_path.exists():
+            # Cache hit: mmap the saved matrix so startup skips
+            # re-embedding entirely and only touched rows page in
+            print(f"  Loading cached embeddings from {cache_path.name}")
+            self.procedure_embeddings = np.load(cache_path, mmap_mode='r')
+        else:
+            # Encode everything in one batched call: sentence-transformers
+            # sorts by length internally, so batches stay dense instead of
+            # paying a dispatch + tokenizer setup per procedure
+            texts = [proc['_embed_text'] for proc in self.knowledge_base]
+            emb = self.model.encode(
+                texts,
+                batch_size=64,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+            # Unit rows mean cosine similarity is one matvec per query;
+            # contiguous float32 is what the SimSIMD kernels expect and
+            # what keeps BLAS on the SGEMM (not DGEMM) fast path
+            self.procedure_embeddings = np.ascontiguousarray(emb, dtype=np.float32)
+            assert self.procedure_embeddings.flags['C_CONTIGUOUS']
+            assert self.procedure_embeddings.dtype == np.float32
+            if cache_path is not None:
+                try:
+                    # Persist as float16: half the file I/O and, since the
+                    # cache is mmapped on load, half the resident memory
+                    np.save(cache_path, self.procedure_embeddings.astype(np.float16))
+                except OSError as e:
+                    print(f"⚠ Could not write embedding cache: {e}")
+
+        if self.use_int8:
+            # Per-row scale keeps the full int8 range; cosine is
+            # invariant to per-row scaling, so no rescale at query time
+            scales = np.max(np.abs(self.procedure_embeddings), axis=1, keepdims=True) / 127.0
+            self.proc_emb_i8 = np.ascontiguousarray(
+                np.round(self.procedure_embeddings / scales), dtype=np.int8
+            )
+
+        # HNSW gives sublinear search once the corpus is large; below the
+        # threshold the exact scan is both faster and simpler
+        if hnswlib is not None and len(self.knowledge_base) >= self._HNSW_MIN_SIZE:
+            index = hnswlib.Index(space='cosine', dim=self.procedure_embeddings.shape[1])
+            index.init_index(max_elements=len(self.knowledge_base), M=16, ef_construction=200)
+            index.add_items(
+                np.asarray(self.procedure_embeddings, dtype=np.float32),
+                np.arange(len(self.knowledge_base))
+            )
+            index.set_ef(50)
+            self._hnsw = index
     
     def diagnose(
         self,
@@ -87,115 +300,207 @@ class KnowledgeBasedDiagnosisEngine:
             (best_match_procedure, top_3_alternatives)
         """
         
-        print("\n" + "="*70)
-        print("🔍 DIAGNOSING FROM OEM MANUALS")
-        print("="*70)
-        print(f"User Symptoms: {user_symptoms}")
-        
-        # Embed user symptoms
-        symptom_embedding = self.model.encode(user_symptoms)
-        print(f"✓ Symptom embedding generated ({len(symptom_embedding)} dimensions)")
+        if self.verbose:
+            print("\n" + "="*70)
+            print("🔍 DIAGNOSING FROM OEM MANUALS")
+            print("="*70)
+            print(f"User Symptoms: {user_symptoms}")
         
-        # Find similar procedures from knowledge base
-        similarities = self._compute_similarities(symptom_embedding)
-        print(f"✓ Computed similarities with {len(self.knowledge_base)} procedures")
-        
-        # Get top matches
-        top_indices = np.argsort(similarities)[::-1][:5]
-        print(f"\n📊 Top 5 matches:")
+        # Embed user symptoms (unit-normalized to match the corpus)
+        symptom_embedding = self._encode(user_symptoms)
         
+        # Find the best-matching procedures (ANN index or exact scan)
+        top_indices, top_similarities = self._top_matches(symptom_embedding, 5)
+        if self.verbose:
+            print(f"✓ Searched {len(self.knowledge_base)} procedures")
+            print(f"\n📊 Top 5 matches:")
+
+        # Lowercase and tokenize once for all candidates
+        symptom_tokens = set(user_symptoms.lower().split())
+
+        # Score candidates without copying their dicts; only the single
+        # best match materializes the full procedure record below
         matches = []
-        for idx in top_indices:
-            if idx < len(self.knowledge_base):
-                proc = self.knowledge_base[idx].copy()
-                proc['similarity_score'] = float(similarities[idx])
-                proc['confidence'] = self._calculate_confidence(
-                    similarities[idx],
-                    user_symptoms,
-                    proc,
-                    user_answers
-                )
-                matches.append(proc)
-                
-                # Print match info
-                print(f"  {len(matches)}. {proc['issue_type']:20s} | Similarity: {similarities[idx]:.3f} | Confidence: {proc['confidence']:.3f} | Source: {proc['source_file']}")
-        
-        # Return best match + alternatives
-        best_match = matches[0] if matches else None
-        alternatives = matches[1:4] if len(matches) > 1 else []
-        
-        if best_match:
-            print(f"\n✓ BEST MATCH: {best_match['issue_type']} (Confidence: {best_match['confidence']:.2%})")
-            print(f"  Source: {best_match['source_file']}")
-            print(f"  Solution steps: {len(best_match['solution_steps'])}")
-            print(f"  Tools needed: {len(best_match['tools_needed'])}")
+        for idx, similarity in zip(top_indices, top_similarities):
+            proc = self.knowledge_base[idx]
+            confidence = self._calculate_confidence(
+                similarity,
+                symptom_tokens,
+                proc,
+                user_answers
+            )
+            matches.append((int(idx), float(similarity), confidence))
+
+            # Print match info
+            if self.verbose:
+                print(f"  {len(matches)}. {proc['issue_type']:20s} | Similarity: {similarity:.3f} | Confidence: {confidence:.3f} | Source: {proc['source_file']}")
+        
+        # Return best match + lightweight alternatives
+        if matches:
+            best_idx, best_similarity, best_confidence = matches[0]
+            best_match = self.knowledge_base[best_idx].copy()
+            best_match['similarity_score'] = best_similarity
+            best_match['confidence'] = best_confidence
         else:
-            print("\n⚠ No matches found in knowledge base")
-        
-        print("="*70 + "\n")
+            best_match = None
+        alternatives = [
+            {
+                'index': idx,
+                'issue_type': self.knowledge_base[idx]['issue_type'],
+                'similarity_score': similarity,
+                'confidence': confidence
+            }
+            for idx, similarity, confidence in matches[1:4]
+        ]
+        
+        if self.verbose:
+            if best_match:
+                print(f"\n✓ BEST MATCH: {best_match['issue_type']} (Confidence: {best_match['confidence']:.2%})")
+                print(f"  Source: {best_match['source_file']}")
+                print(f"  Solution steps: {len(best_match['solution_steps'])}")
+                print(f"  Tools needed: {len(best_match['tools_needed'])}")
+            else:
+                print("\n⚠ No matches found in knowledge base")
+            print("="*70 + "\n")
         
         return best_match, alternatives
     
+    _HNSW_MIN_SIZE = 1000
+
+    def _top_matches(self, query_embedding: np.ndarray, k: int):
+        """Return (indices, similarities) of the k best procedures
+
+        Routes through the HNSW index when one was built; otherwise does
+        an exact scan with argpartition top-k selection.
+        """
+        if self._hnsw is not None:
+            labels, distances = self._hnsw.knn_query(query_embedding.reshape(1, -1), k=k)
+            return labels[0], 1.0 - distances[0]
+
+        similarities = self._compute_similarities(query_embedding)
+        k = min(k, similarities.size)
+        if not k:
+            return np.array([], dtype=int), similarities
+        partition = np.argpartition(-similarities, k - 1)[:k]
+        order = partition[np.argsort(-similarities[partition])]
+        return order, similarities[order]
+
+    @staticmethod
+    def _unit(vec: np.ndarray) -> np.ndarray:
+        """Scale a vector to unit length (zero vectors pass through)"""
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    _EMBED_CACHE_MAX = 4096
+
+    def _encode(self, text: str) -> np.ndarray:
+        """Encode text to a unit vector, reusing cached embeddings
+
+        Keyed by SHA-1 of the input so repeated symptom strings skip the
+        transformer forward pass entirely; oldest entries are evicted
+        once the cache exceeds _EMBED_CACHE_MAX.
+        """
+        key = hashlib.sha1(text.encode()).digest()
+        cached = self._embed_cache.get(key)
+        if cached is not None:
+            self._embed_cache.move_to_end(key)
+            return cached
+
+        embedding = self._unit(self.model.encode(text))
+        self._embed_cache[key] = embedding
+        if len(self._embed_cache) > self._EMBED_CACHE_MAX:
+            self._embed_cache.popitem(last=False)
+        return embedding
+
+    def encode_many(self, texts: List[str]) -> np.ndarray:
+        """Encode several texts in one batched forward pass
+
+        Callers needing multiple embeddings in a single request should
+        batch them here rather than issue sequential single encodes: cache
+        hits are served directly and all misses share one model call. For
+        a single uncached text this matches _encode.
+        """
+        vectors = [None] * len(texts)
+        misses = []
+        for i, text in enumerate(texts):
+            key = hashlib.sha1(text.encode()).digest()
+            cached = self._embed_cache.get(key)
+            if cached is not None:
+                self._embed_cache.move_to_end(key)
+                vectors[i] = cached
+            else:
+                misses.append(i)
+
+        if misses:
+            encoded = self.model.encode(
+                [texts[i] for i in misses],
+                batch_size=len(misses),
+                convert_to_numpy=True
+            )
+            for i, vec in zip(misses, encoded):
+                vec = self._unit(vec)
+                self._embed_cache[hashlib.sha1(texts[i].encode()).digest()] = vec
+                if len(self._embed_cache) > self._EMBED_CACHE_MAX:
+                    self._embed_cache.popitem(last=False)
+                vectors[i] = vec
+
+        return np.array(vectors)
+
     def _compute_similarities(self, query_embedding: np.ndarray) -> np.ndarray:
-        """Compute cosine similarity between query and all procedures"""
-        
+        """Compute cosine similarity between query and all procedures
+
+        Procedure embeddings are unit-normalized at build time and the
+        query is normalized at encode time, so this is one dot product
+        per procedure with no norm passes.
+        """
+
         if len(self.procedure_embeddings) == 0:
             return np.array([])
-        
-        # Cosine similarity
-        similarities = np.dot(
-            self.procedure_embeddings,
-            query_embedding
-        ) / (
-            np.linalg.norm(self.procedure_embeddings, axis=1) *
-            np.linalg.norm(query_embedding)
-        )
-        
-        return similarities
+
+        if simsimd is not None:
+            query = np.ascontiguousarray(query_embedding, dtype=np.float32)
+            if self.proc_emb_i8 is not None:
+                scale = np.max(np.abs(query)) / 127.0
+                if scale > 0:
+                    query = np.round(query / scale)
+                query = query.astype(np.int8)
+                matrix = self.proc_emb_i8
+            else:
+                # Match the stored dtype - the mmapped cache is float16,
+                # and SimSIMD has native kernels for both f16 and f32
+                matrix = self.procedure_embeddings
+                if query.dtype != matrix.dtype:
+                    query = query.astype(matrix.dtype)
+            distances = simsimd.cdist(query.reshape(1, -1), matrix, metric="cosine")
+            return 1.0 - np.asarray(distances).ravel()
+
+        return self.procedure_embeddings @ query_embedding
     
     def _calculate_confidence(
         self,
         similarity_score: float,
-        user_symptoms: str,
+        symptom_tokens: set,
         procedure: Dict,
         user_answers: List[Dict]
     ) -> float:
-        """Calculate confidence based on multiple factors"""
-        
-        # Start with higher base confidence (75% of similarity instead of 60%)
-        confidence = similarity_score * 0.75
-        
+        """Calculate confidence based on multiple factors
+
+        symptom_tokens is the lowercased, whitespace-split user input -
+        tokenized once by the caller and shared across candidates.
+        """
+
         # Boost if user symptoms mention specific keywords from procedure
-        symptoms_lower = user_symptoms.lower()
-        issue_keywords = procedure['issue_type'].split('_')
-        
-        keyword_matches = 0
-        for keyword in issue_keywords:
-            if keyword in symptoms_lower:
-                keyword_matches += 1
-        
-        # More aggressive keyword bonus (0.08 per match, up to 0.24)
-        confidence += min(keyword_matches * 0.08, 0.24)
-        
-        # Progressive bonus for each answer (not just >2)
-        # 1 answer: +5%, 2 answers: +10%, 3+ answers: +15%
-        if user_answers:
-            answer_count = len(user_answers)
-            if answer_count == 1:
-                confidence += 0.05
-            elif answer_count == 2:
-                confidence += 0.10
-            elif answer_count >= 3:
-                confidence += 0.15
-            
-            # Extra bonus for detailed answers (>20 words)
-            detailed_count = sum(1 for a in user_answers 
-                               if isinstance(a, dict) and len(a.get('answer', '').split()) > 20)
-            if detailed_count > 0:
-                confidence += 0.05 * detailed_count  # +5% per detailed answer
-        
-        # Cap at 0.95
-        return min(confidence, 0.95)
+        keyword_matches = len(procedure['_kw_set'] & symptom_tokens)
+
+        answer_count = len(user_answers) if user_answers else 0
+        detailed_count = sum(
+            1 for a in user_answers
+            if isinstance(a, dict) and len(a.get('answer', '').split()) > 20
+        ) if user_answers else 0
+
+        return _confidence_numeric(
+            float(similarity_score), keyword_matches, answer_count, detailed_count
+        )
     
     def generate_question(
         self,
@@ -290,9 +595,26 @@ class KnowledgeBasedDiagnosisEngine:
         
         # Re-run diagnosis with accumulated context
         combined_symptoms = f"{user_symptoms} {answer}"
-        
-        # Re-embed and find matches
-        symptom_embedding = self.model.encode(combined_symptoms)
+
+        # Embedding averages compose almost linearly, so fold only the new
+        # answer into a running mean instead of re-encoding the combined
+        # text every turn; every third turn re-encodes fully to correct
+        # any drift from the approximation
+        turn = len(all_answers) if all_answers else 1
+        session_key = hashlib.sha1(user_symptoms.encode()).digest()
+        previous = self._session_embeddings.get(session_key)
+        if previous is not None and turn % 3 != 0:
+            prev_embedding, n = previous
+            answer_embedding = self._encode(answer)
+            symptom_embedding = self._unit((prev_embedding * n + answer_embedding) / (n + 1))
+        else:
+            symptom_embedding = self._encode(combined_symptoms)
+            n = max(turn, 1)
+        self._session_embeddings[session_key] = (symptom_embedding, n + 1)
+        self._session_embeddings.move_to_end(session_key)
+        if len(self._session_embeddings) > 1024:
+            self._session_embeddings.popitem(last=False)
+
         similarities = self._compute_similarities(symptom_embedding)
         
         # Check if answer changed the top match
@@ -304,7 +626,7 @@ class KnowledgeBasedDiagnosisEngine:
         old_confidence = current_diagnosis.get('confidence', 0.5)
         new_base_confidence = self._calculate_confidence(
             new_match['similarity_score'],
-            combined_symptoms,
+            set(combined_symptoms.lower().split()),
             new_match,
             all_answers
         )
@@ -313,15 +635,65 @@ class KnowledgeBasedDiagnosisEngine:
         updated_confidence = min(new_base_confidence + confidence_delta, 0.95)
         new_match['confidence'] = updated_confidence
         
-        print(f"\n📊 Confidence Update:")
-        print(f"  Previous: {old_confidence:.2%}")
-        print(f"  Base (re-match): {new_base_confidence:.2%}")
-        print(f"  Answer delta: {confidence_delta:+.2%}")
-        print(f"  Updated: {updated_confidence:.2%}")
-        print(f"  Keywords extracted: {keywords}")
+        if self.verbose:
+            print(f"\n📊 Confidence Update:")
+            print(f"  Previous: {old_confidence:.2%}")
+            print(f"  Base (re-match): {new_base_confidence:.2%}")
+            print(f"  Answer delta: {confidence_delta:+.2%}")
+            print(f"  Updated: {updated_confidence:.2%}")
+            print(f"  Keywords extracted: {keywords}")
         
         return new_match, confidence_delta
     
+    def diagnose_batch(self, symptoms_list: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """Triage a batch of symptom descriptions in one pass
+
+        The embedding step is parallelized across worker processes (the
+        transformer forward pass is GIL-bound), then the whole batch is
+        scored with a single matrix-matrix product and row-wise top-k
+        selection. Returns, per input, a list of lightweight
+        {'index', 'issue_type', 'similarity_score'} records.
+        """
+        if not symptoms_list or len(self.procedure_embeddings) == 0:
+            return [[] for _ in symptoms_list]
+
+        if self._mp_pool is None and hasattr(self.model, 'start_multi_process_pool'):
+            self._mp_pool = self.model.start_multi_process_pool(['cpu'] * 3)
+
+        if self._mp_pool is not None:
+            embeddings = self.model.encode_multi_process(symptoms_list, self._mp_pool)
+        else:
+            embeddings = self.model.encode(symptoms_list, batch_size=64, convert_to_numpy=True)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        embeddings = embeddings / np.clip(
+            np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None
+        )
+
+        # One SGEMM for the whole batch, then per-row top-k
+        sims = embeddings @ np.asarray(self.procedure_embeddings, dtype=np.float32).T
+        k = min(top_k, sims.shape[1])
+        partition = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+
+        results = []
+        for row, candidates in zip(sims, partition):
+            order = candidates[np.argsort(-row[candidates])]
+            results.append([
+                {
+                    'index': int(i),
+                    'issue_type': self.knowledge_base[i]['issue_type'],
+                    'similarity_score': float(row[i])
+                }
+                for i in order
+            ])
+        return results
+
+    def __del__(self):
+        if getattr(self, '_mp_pool', None) is not None:
+            try:
+                self.model.stop_multi_process_pool(self._mp_pool)
+            except Exception:
+                pass
+
     def _generate_recommendation(self, procedure: Dict) -> str:
         """Generate recommendation text"""
         
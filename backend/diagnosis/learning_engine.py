@@ -7,12 +7,104 @@ Updates confidence scores based on outcomes
 """
 
 import json
+import os
+import asyncio
+import hashlib
 import asyncpg
+from math import log, sqrt
 from typing import List, Dict, Tuple
-from collections import Counter, defaultdict
 from datetime import datetime, timedelta
-import numpy as np
 from pathlib import Path
+import numpy as np
+
+try:
+    import orjson  # Rust JSON encoder, ~5-10x stdlib on encode
+    _HAS_ORJSON = True
+except ImportError:
+    _HAS_ORJSON = False
+
+
+def _load_json(path: Path) -> Dict:
+    """Read a JSON file, using orjson when available"""
+    data = path.read_bytes()
+    return orjson.loads(data) if _HAS_ORJSON else json.loads(data)
+
+
+def _dump_json_atomic(path: Path, obj: Dict):
+    """
+    Write JSON to a temp file and os.replace it into place, so a crash
+    mid-export never leaves a truncated file behind
+    """
+    if _HAS_ORJSON:
+        payload = orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+    else:
+        payload = json.dumps(obj, indent=2, sort_keys=True).encode()
+
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(payload)
+    os.replace(tmp, path)
+
+
+# SQL hoisted to module constants: asyncpg's per-connection statement
+# cache keys on the exact query text, so issuing each statement from a
+# single shared literal guarantees the server-side prepared plan is
+# reused across every cycle (see statement_cache_size on the pool)
+_SQL_DISCOVER_PATTERNS = """
+SELECT
+    ds.device_category AS category,
+    (SELECT array_agg(DISTINCT s ORDER BY s)
+     FROM unnest(ds.initial_symptoms || ds.visual_symptoms) s) AS symptoms,
+    ds.final_diagnosis AS cause,
+    COUNT(*) AS total,
+    SUM(CASE WHEN ds.problem_resolved THEN 1 ELSE 0 END) AS success,
+    array_agg(ds.session_id::text) AS sessions
+FROM diagnostic_sessions ds
+WHERE ds.created_at >= $1
+    AND ds.final_diagnosis IS NOT NULL
+    AND ds.tutorial_selected_id IS NOT NULL
+GROUP BY 1, 2, 3
+HAVING COUNT(*) >= $2
+    AND SUM(CASE WHEN ds.problem_resolved THEN 1 ELSE 0 END)::float / COUNT(*) >= $3
+"""
+
+_SQL_EXISTING_PATTERNS = """
+SELECT id, category, symptom_key, cause
+FROM learned_patterns
+WHERE category = ANY($1::text[])
+"""
+
+_SQL_UPDATE_PATTERN_STATS = """
+UPDATE learned_patterns
+SET support_count = support_count + $1,
+    success_rate = (success_rate + $2) / 2.0,
+    confidence = $3,
+    last_updated = CURRENT_TIMESTAMP
+WHERE id = $4
+"""
+
+_SQL_AMBIGUOUS_SESSIONS = """
+SELECT 
+    ds.session_id,
+    ds.device_category,
+    ds.initial_symptoms,
+    ds.final_diagnosis,
+    bs_start.belief_vector as initial_beliefs,
+    bs_end.belief_vector as final_beliefs
+FROM diagnostic_sessions ds
+JOIN LATERAL (
+    SELECT belief_vector FROM belief_snapshots
+    WHERE session_id = ds.session_id
+    ORDER BY snapshot_order ASC LIMIT 1
+) bs_start ON TRUE
+JOIN LATERAL (
+    SELECT belief_vector FROM belief_snapshots
+    WHERE session_id = ds.session_id
+    ORDER BY snapshot_order DESC LIMIT 1
+) bs_end ON TRUE
+WHERE ds.created_at >= $1
+    AND ds.problem_resolved = TRUE
+    AND ds.questions_asked >= 2
+"""
 
 
 class LearningEngine:
@@ -43,145 +135,101 @@ class LearningEngine:
         """
         since = datetime.now() - timedelta(days=lookback_days)
         
-        query = """
-        SELECT 
-            ds.initial_symptoms || ds.visual_symptoms as symptoms,
-            ds.final_diagnosis as cause,
-            ds.device_category as category,
-            ds.problem_resolved,
-            ds.session_id
-        FROM diagnostic_sessions ds
-        WHERE ds.created_at >= $1
-            AND ds.final_diagnosis IS NOT NULL
-            AND ds.tutorial_selected_id IS NOT NULL
-        ORDER BY ds.created_at DESC
-        """
-        
-        rows = await self.db.fetch(query, since)
-        
-        # Group by (category, symptoms, cause)
-        pattern_groups = defaultdict(lambda: {"success": 0, "total": 0, "sessions": []})
-        
-        for row in rows:
-            # Sort symptoms for consistent key
-            symptoms = tuple(sorted(set(row['symptoms'])))
-            key = (row['category'], symptoms, row['cause'])
-            
-            pattern_groups[key]['total'] += 1
-            if row['problem_resolved']:
-                pattern_groups[key]['success'] += 1
-            pattern_groups[key]['sessions'].append(str(row['session_id']))
-        
-        # Filter and create candidates
+        # Group and threshold server-side: only (category, symptoms, cause)
+        # groups meeting the support and success-rate minimums cross the
+        # wire, instead of every session row being regrouped in Python
+        rows = await self.db.fetch(_SQL_DISCOVER_PATTERNS, since,
+                                   self.MIN_SUPPORT, self.MIN_SUCCESS_RATE)
+
         new_patterns = []
-        
-        for (category, symptoms, cause), stats in pattern_groups.items():
-            if stats['total'] < self.MIN_SUPPORT:
-                continue
-            
-            success_rate = stats['success'] / stats['total']
-            
-            if success_rate >= self.MIN_SUCCESS_RATE:
-                # Check if pattern already exists
-                existing = await self._check_existing_pattern(category, symptoms, cause)
-                
-                if existing:
-                    # Update existing pattern
-                    await self._update_pattern_stats(
-                        existing['id'],
-                        stats['total'],
-                        success_rate
-                    )
-                else:
-                    # Create new candidate
-                    pattern = await self._create_pattern_candidate(
-                        category=category,
-                        symptoms=list(symptoms),
-                        cause=cause,
-                        support=stats['total'],
-                        success_rate=success_rate,
-                        sessions=stats['sessions']
-                    )
-                    new_patterns.append(pattern)
-        
-        return new_patterns
-    
-    async def _check_existing_pattern(self, category: str, symptoms: Tuple, cause: str):
-        """Check if pattern already exists in learned_patterns or candidates"""
-        query = """
-        SELECT id, confidence, support_count
-        FROM learned_patterns
-        WHERE category = $1 
-            AND symptom_combination = $2 
-            AND cause = $3
-        """
-        return await self.db.fetchrow(query, category, list(symptoms), cause)
-    
-    async def _create_pattern_candidate(self, category: str, symptoms: List[str], 
-                                       cause: str, support: int, 
-                                       success_rate: float, sessions: List[str]) -> Dict:
-        """Create new pattern candidate awaiting review"""
-        confidence = self._calculate_pattern_confidence(support, success_rate)
-        
-        query = """
-        INSERT INTO pattern_candidates 
-        (symptom_combination, cause, category, observed_count, 
-         success_count, confidence, supporting_session_ids)
-        VALUES ($1, $2, $3, $4, $5, $6, $7)
-        RETURNING id
-        """
-        
-        pattern_id = await self.db.fetchval(
-            query,
-            symptoms,
-            cause,
-            category,
-            support,
-            int(support * success_rate),
-            confidence,
-            sessions
-        )
-        
-        return {
-            "id": pattern_id,
-            "category": category,
-            "symptoms": symptoms,
-            "cause": cause,
-            "confidence": confidence,
-            "support": support,
-            "success_rate": success_rate
+        if not rows:
+            return new_patterns
+
+        # Fetch every already-known pattern for the involved categories in
+        # one query instead of a fetchrow per candidate group, then match
+        # in memory on the stored symptom_key
+        existing_rows = await self.db.fetch(
+            _SQL_EXISTING_PATTERNS, list({r['category'] for r in rows}))
+        existing = {
+            (r['category'], r['symptom_key'], r['cause']): r['id']
+            for r in existing_rows
         }
+
+        # Rows are consumed as delivered: symptoms arrive pre-sorted (the
+        # canonical key is a plain join) and the session-id text[] passes
+        # straight through to the candidate insert - no per-row str()
+        # conversion or intermediate dict copies, and HAVING means session
+        # lists for discarded groups were never built at all
+        stat_updates = []
+        candidate_records = []
+        for row in rows:
+            success_rate = row['success'] / row['total']
+            key = (row['category'], "_".join(row['symptoms']), row['cause'])
+            existing_id = existing.get(key)
+            if existing_id is not None:
+                # Update existing pattern (batched below)
+                stat_updates.append((
+                    row['total'],
+                    success_rate,
+                    self._calculate_pattern_confidence(row['total'], success_rate),
+                    existing_id
+                ))
+            else:
+                # New candidate; the insert itself is batched below
+                confidence = self._calculate_pattern_confidence(row['total'], success_rate)
+                candidate_records.append((
+                    list(row['symptoms']),
+                    row['cause'],
+                    row['category'],
+                    row['total'],
+                    int(row['success']),
+                    confidence,
+                    row['sessions']
+                ))
+                new_patterns.append({
+                    "category": row['category'],
+                    "symptoms": list(row['symptoms']),
+                    "cause": row['cause'],
+                    "confidence": confidence,
+                    "support": row['total'],
+                    "success_rate": success_rate
+                })
+
+        if stat_updates:
+            await self.db.executemany(_SQL_UPDATE_PATTERN_STATS, stat_updates)
+
+        # COPY is PostgreSQL's fastest bulk-load path: all new candidates
+        # land in one round-trip instead of an INSERT ... RETURNING each
+        if candidate_records:
+            async with self.db.acquire() as conn:
+                await conn.copy_records_to_table(
+                    'pattern_candidates',
+                    records=candidate_records,
+                    columns=['symptom_combination', 'cause', 'category',
+                             'observed_count', 'success_count', 'confidence',
+                             'supporting_session_ids']
+                )
+
+        return new_patterns
     
     def _calculate_pattern_confidence(self, support: int, success_rate: float) -> float:
         """
         Calculate confidence score for pattern
-        
-        Factors:
-        - Success rate (primary)
-        - Support count (secondary, with diminishing returns)
-        """
-        # Base confidence from success rate
-        base = success_rate
-        
-        # Boost from support count (logarithmic)
-        support_boost = min(0.2, np.log(support) / 20)
-        
-        return min(1.0, base + support_boost)
-    
-    async def _update_pattern_stats(self, pattern_id: int, new_support: int, 
-                                    new_success_rate: float):
-        """Update existing pattern with new observations"""
-        query = """
-        UPDATE learned_patterns
-        SET support_count = support_count + $1,
-            success_rate = (success_rate + $2) / 2.0,
-            confidence = $3,
-            last_updated = CURRENT_TIMESTAMP
-        WHERE id = $4
+
+        Wilson score lower bound (95%) on the success proportion: unlike
+        the old success_rate + log-support boost it cannot rank a lucky
+        2-for-2 pattern above a proven 18-for-20 one, so downstream
+        filters drop weak candidates before they reach SQL and export
         """
-        
-        new_confidence = self._calculate_pattern_confidence(new_support, new_success_rate)
-        await self.db.execute(query, new_support, new_success_rate, new_confidence, pattern_id)
+        if support <= 0:
+            return 0.0
+
+        z = 1.96  # 95% confidence
+        n = support
+        p = success_rate
+
+        return (p + z * z / (2 * n)
+                - z * sqrt((p * (1 - p) + z * z / (4 * n)) / n)) / (1 + z * z / n)
     
     async def generate_new_questions(self, lookback_days: int = 14) -> List[Dict]:
         """
@@ -197,138 +245,114 @@ class LearningEngine:
         """
         since = datetime.now() - timedelta(days=lookback_days)
         
-        # Get sessions with low start confidence, high end confidence
-        query = """
-        SELECT 
-            ds.session_id,
-            ds.device_category,
-            ds.initial_symptoms,
-            ds.final_diagnosis,
-            bs_start.belief_vector as initial_beliefs,
-            bs_end.belief_vector as final_beliefs
-        FROM diagnostic_sessions ds
-        JOIN belief_snapshots bs_start 
-            ON bs_start.session_id = ds.session_id 
-            AND bs_start.snapshot_order = 0
-        JOIN belief_snapshots bs_end 
-            ON bs_end.session_id = ds.session_id 
-            AND bs_end.snapshot_order = (
-                SELECT MAX(snapshot_order) 
-                FROM belief_snapshots 
-                WHERE session_id = ds.session_id
-            )
-        WHERE ds.created_at >= $1
-            AND ds.problem_resolved = TRUE
-            AND ds.questions_asked >= 2
-        """
-        
-        rows = await self.db.fetch(query, since)
-        
-        question_candidates = []
-        
-        for row in rows:
-            initial_beliefs = row['initial_beliefs']
-            final_beliefs = row['final_beliefs']
-            
-            # Find belief with biggest gain
-            max_gain_cause = None
-            max_gain = 0
-            
-            for cause in final_beliefs.keys():
-                gain = final_beliefs.get(cause, 0) - initial_beliefs.get(cause, 0)
-                if gain > max_gain:
-                    max_gain = gain
-                    max_gain_cause = cause
-            
-            if max_gain > 0.3:  # Significant belief change
-                # Find which questions caused this
-                breakthrough_questions = await self._find_breakthrough_questions(
-                    row['session_id'],
-                    max_gain_cause
-                )
-                
-                if breakthrough_questions:
-                    question_candidates.append({
-                        "category": row['device_category'],
-                        "cause": max_gain_cause,
-                        "symptoms": row['initial_symptoms'],
-                        "breakthrough_questions": breakthrough_questions,
-                        "gain": max_gain
-                    })
-        
-        # Cluster similar candidates and generate new questions
-        new_questions = await self._cluster_and_generate_questions(question_candidates)
-        
-        return new_questions
-    
-    async def _find_breakthrough_questions(self, session_id: str, cause: str) -> List[Dict]:
-        """Find questions that significantly increased belief in this cause"""
-        query = """
-        SELECT 
-            question_id,
-            question_text,
-            answer,
-            belief_change
-        FROM question_interactions
-        WHERE session_id = $1
-            AND belief_change IS NOT NULL
-        ORDER BY answer_timestamp
-        """
-        
-        rows = await self.db.fetch(query, session_id)
-        
-        breakthrough = []
-        for row in rows:
-            if row['belief_change']:
-                # Check if this question boosted the cause
-                change = row['belief_change'].get(cause, {})
-                if change.get('after', 0) - change.get('before', 0) > 0.2:
-                    breakthrough.append({
-                        "question_id": row['question_id'],
-                        "question": row['question_text'],
-                        "answer": row['answer']
+        # Get sessions with low start confidence, high end confidence:
+        # LATERAL ORDER BY/LIMIT 1 joins fetch the first and last snapshot
+        # as two index seeks per session
+        query = _SQL_AMBIGUOUS_SESSIONS
+        
+        # Stream sessions through a server-side cursor: memory stays
+        # bounded by the prefetch window and only the fields we use are
+        # kept, however long the history is
+        rows = []
+        async with self.db.acquire() as conn:
+            async with conn.transaction():
+                async for record in conn.cursor(query, since, prefetch=1000):
+                    rows.append({
+                        'session_id': record['session_id'],
+                        'device_category': record['device_category'],
+                        'initial_symptoms': record['initial_symptoms'],
+                        'initial_beliefs': record['initial_beliefs'],
+                        'final_beliefs': record['final_beliefs']
                     })
-        
-        return breakthrough
+
+        question_candidates = []
+
+        # Vectorize the belief-gain argmax: two (sessions x causes)
+        # matrices and one subtraction replace S*C dict lookups in a
+        # Python loop
+        causes = sorted({c for r in rows for c in r['final_beliefs']})
+        if rows and causes:
+            initial = np.array(
+                [[r['initial_beliefs'].get(c, 0.0) for c in causes] for r in rows]
+            )
+            final = np.array(
+                [[r['final_beliefs'].get(c, 0.0) for c in causes] for r in rows]
+            )
+            gains = final - initial
+            best_idx = gains.argmax(axis=1)
+            max_gains = gains[np.arange(len(rows)), best_idx]
+        else:
+            best_idx = max_gains = ()
+
+        significant = [
+            (row, causes[cause_idx], float(max_gain))
+            for row, cause_idx, max_gain in zip(rows, best_idx, max_gains)
+            if max_gain > 0.3  # Significant belief change
+        ]
+
+        # One aggregate query clusters the breakthroughs: the belief-delta
+        # filter, the per-(category, cause) grouping, and the "most common
+        # question" pick via mode() all happen server-side, so no
+        # breakthrough detail rows cross the wire
+        for r in await self._cluster_and_generate_questions(significant):
+            question_candidates.append({
+                "category": r['category'],
+                "cause": r['cause'],
+                "based_on_question": r['based_on_question'],
+                "observed_count": r['observed_count'],
+                "avg_gain": float(r['avg_gain'])
+            })
+
+        return question_candidates
     
-    async def _cluster_and_generate_questions(self, candidates: List[Dict]) -> List[Dict]:
+    async def _cluster_and_generate_questions(self, significant: List[Tuple]) -> List:
         """
-        Cluster similar situations and generate generalized questions
-        
-        For now, just returns promising candidates
+        Cluster breakthrough questions by (category, cause) in SQL
+
+        For now, just surfaces the modal breakthrough question per group
         Future: Use clustering to generalize patterns
         """
-        # Group by (category, cause)
-        grouped = defaultdict(list)
-        for c in candidates:
-            key = (c['category'], c['cause'])
-            grouped[key].append(c)
-        
-        new_questions = []
-        
-        for (category, cause), group in grouped.items():
-            if len(group) < 3:  # Need multiple examples
-                continue
-            
-            # Find common breakthrough question patterns
-            question_counter = Counter()
-            for item in group:
-                for q in item['breakthrough_questions']:
-                    question_counter[q['question_id']] += 1
-            
-            # Most common breakthrough question
-            if question_counter:
-                most_common_q_id = question_counter.most_common(1)[0][0]
-                
-                new_questions.append({
-                    "category": category,
-                    "cause": cause,
-                    "based_on_question": most_common_q_id,
-                    "observed_count": len(group),
-                    "avg_gain": np.mean([item['gain'] for item in group])
-                })
-        
-        return new_questions
+        if not significant:
+            return []
+
+        return await self.db.fetch("""
+            WITH hits AS (
+                SELECT t.category, t.cause, t.gain,
+                       qi.session_id, qi.question_id
+                FROM question_interactions qi
+                JOIN unnest($1::uuid[], $2::text[], $3::text[], $4::float[])
+                    AS t(session_id, cause, category, gain)
+                    ON qi.session_id = t.session_id
+                WHERE qi.belief_change IS NOT NULL
+                    AND (qi.belief_change->t.cause->>'after')::float
+                        - (qi.belief_change->t.cause->>'before')::float > 0.2
+            ),
+            per_session AS (
+                SELECT category, cause, session_id, MAX(gain) AS gain
+                FROM hits
+                GROUP BY 1, 2, 3
+            )
+            SELECT m.category, m.cause, m.based_on_question,
+                   s.observed_count, s.avg_gain
+            FROM (
+                SELECT category, cause,
+                       mode() WITHIN GROUP (ORDER BY question_id) AS based_on_question
+                FROM hits
+                GROUP BY 1, 2
+            ) m
+            JOIN (
+                SELECT category, cause,
+                       COUNT(*) AS observed_count,
+                       AVG(gain) AS avg_gain
+                FROM per_session
+                GROUP BY 1, 2
+            ) s USING (category, cause)
+            WHERE s.observed_count >= 3
+        """,
+            [row['session_id'] for row, _, _ in significant],
+            [cause for _, cause, _ in significant],
+            [row['device_category'] for row, _, _ in significant],
+            [gain for _, _, gain in significant])
     
     async def update_question_effectiveness(self):
         """
@@ -353,21 +377,33 @@ class LearningEngine:
         """
         
         rows = await self.db.fetch(query)
-        
-        for row in rows:
-            await self.db.execute("""
-                INSERT INTO question_analytics 
-                (question_id, category, times_asked, times_skipped, 
-                 avg_information_gain, correlation_with_success, last_asked)
-                VALUES ($1, 'PC', $2, $3, $4, $5, CURRENT_TIMESTAMP)
-                ON CONFLICT (question_id) DO UPDATE SET
-                    times_asked = question_analytics.times_asked + $2,
-                    times_skipped = question_analytics.times_skipped + $3,
-                    avg_information_gain = $4,
-                    correlation_with_success = $5,
-                    last_asked = CURRENT_TIMESTAMP
-            """, row['question_id'], row['times_asked'], row['times_skipped'],
-                row['avg_gain'] or 0.0, row['success_rate'] or 0.0)
+
+        if not rows:
+            return
+
+        # Upsert every question in one round-trip: the column arrays are
+        # unnested server-side, so N per-row statements collapse into a
+        # single parse/plan/execute regardless of how many questions ran
+        await self.db.execute("""
+            INSERT INTO question_analytics
+            (question_id, category, times_asked, times_skipped,
+             avg_information_gain, correlation_with_success, last_asked)
+            SELECT t.question_id, 'PC', t.times_asked, t.times_skipped,
+                   t.avg_gain, t.success_rate, CURRENT_TIMESTAMP
+            FROM unnest($1::text[], $2::int[], $3::int[], $4::float[], $5::float[])
+                AS t(question_id, times_asked, times_skipped, avg_gain, success_rate)
+            ON CONFLICT (question_id) DO UPDATE SET
+                times_asked = question_analytics.times_asked + EXCLUDED.times_asked,
+                times_skipped = question_analytics.times_skipped + EXCLUDED.times_skipped,
+                avg_information_gain = EXCLUDED.avg_information_gain,
+                correlation_with_success = EXCLUDED.correlation_with_success,
+                last_asked = CURRENT_TIMESTAMP
+        """,
+            [r['question_id'] for r in rows],
+            [r['times_asked'] for r in rows],
+            [r['times_skipped'] for r in rows],
+            [r['avg_gain'] or 0.0 for r in rows],
+            [r['success_rate'] or 0.0 for r in rows])
     
     async def approve_pattern(self, pattern_id: int) -> bool:
         """
@@ -380,24 +416,36 @@ class LearningEngine:
         
         if not candidate:
             return False
-        
-        # Create pattern
-        pattern_id = f"{candidate['category']}_{candidate['cause']}_{hash(tuple(candidate['symptom_combination']))}"
-        
-        await self.db.execute("""
-            INSERT INTO learned_patterns
-            (pattern_id, category, symptom_combination, cause, confidence,
-             support_count, success_rate, source, approved)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, 'learned', TRUE)
-        """, pattern_id, candidate['category'], candidate['symptom_combination'],
-            candidate['cause'], candidate['confidence'], candidate['observed_count'],
-            candidate['success_count'] / candidate['observed_count'] if candidate['observed_count'] > 0 else 0)
-        
-        # Mark as reviewed
-        await self.db.execute("""
-            UPDATE pattern_candidates SET reviewed = TRUE WHERE id = $1
-        """, pattern_id)
-        
+
+        # Key for the learned pattern; kept separate from the integer
+        # candidate id so the reviewed UPDATE below still matches.
+        # blake2b instead of hash(): Python's hash() is randomized per
+        # interpreter run, so the same pattern got a new id after every
+        # restart and the UNIQUE(pattern_id) dedup never fired
+        digest = hashlib.blake2b(
+            "|".join([candidate['category'], candidate['cause'],
+                      *sorted(candidate['symptom_combination'])]).encode(),
+            digest_size=8
+        ).hexdigest()
+        new_pattern_key = f"{candidate['category']}_{candidate['cause']}_{digest}"
+
+        # Insert the pattern and mark the candidate reviewed atomically,
+        # in a single round-trip
+        async with self.db.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    WITH ins AS (
+                        INSERT INTO learned_patterns
+                        (pattern_id, category, symptom_combination, cause, confidence,
+                         support_count, success_rate, source, approved)
+                        VALUES ($1, $2, $3, $4, $5, $6, $7, 'learned', TRUE)
+                    )
+                    UPDATE pattern_candidates SET reviewed = TRUE WHERE id = $8
+                """, new_pattern_key, candidate['category'], candidate['symptom_combination'],
+                    candidate['cause'], candidate['confidence'], candidate['observed_count'],
+                    candidate['success_count'] / candidate['observed_count'] if candidate['observed_count'] > 0 else 0,
+                    pattern_id)
+
         return True
     
     async def export_to_json(self, output_path: str = None):
@@ -412,79 +460,73 @@ class LearningEngine:
         
         # Load existing mappings
         mappings_file = Path(output_path) / "symptom_mappings.json"
-        if mappings_file.exists():
-            with open(mappings_file) as f:
-                mappings = json.load(f)
-        else:
-            mappings = {}
-        
-        # Get approved patterns
-        patterns = await self.db.fetch("""
-            SELECT category, symptom_combination, cause, confidence
-            FROM learned_patterns
-            WHERE approved = TRUE AND confidence >= 0.7
-        """)
-        
-        # Merge into mappings
-        for p in patterns:
-            category = p['category']
-            if category not in mappings:
-                mappings[category] = {}
-            
-            # Create symptom key (concatenated sorted symptoms)
-            symptom_key = "_".join(sorted(p['symptom_combination']))
-            
-            if symptom_key not in mappings[category]:
-                mappings[category][symptom_key] = {}
-            
-            mappings[category][symptom_key][p['cause']] = p['confidence']
+        mappings = _load_json(mappings_file) if mappings_file.exists() else {}
+        
+        # Merge approved patterns, streamed so the export never holds the
+        # full result set alongside the mappings dict
+        patterns_exported = 0
+        async with self.db.acquire() as conn:
+            async with conn.transaction():
+                async for p in conn.cursor("""
+                    SELECT category, symptom_key, cause, confidence
+                    FROM learned_patterns
+                    WHERE approved = TRUE AND confidence >= 0.7
+                """, prefetch=1000):
+                    category = p['category']
+                    if category not in mappings:
+                        mappings[category] = {}
+
+                    # symptom_key is a stored generated column - no
+                    # per-row sort/join here
+                    symptom_key = p['symptom_key']
+
+                    if symptom_key not in mappings[category]:
+                        mappings[category][symptom_key] = {}
+
+                    mappings[category][symptom_key][p['cause']] = p['confidence']
+                    patterns_exported += 1
         
         # Write back
-        with open(mappings_file, 'w') as f:
-            json.dump(mappings, f, indent=2)
+        _dump_json_atomic(mappings_file, mappings)
         
         print(f"✅ Exported learned patterns to {mappings_file}")
         
         # Export questions (similar process)
         questions_file = Path(output_path) / "questions.json"
-        if questions_file.exists():
-            with open(questions_file) as f:
-                questions = json.load(f)
-        else:
-            questions = {}
-        
-        learned_q = await self.db.fetch("""
-            SELECT * FROM learned_questions
-            WHERE approved = TRUE AND information_gain_avg >= $1
-        """, self.MIN_INFO_GAIN)
-        
-        for q in learned_q:
-            category = q['category']
-            context = q['issue_context']
-            
-            if category not in questions:
-                questions[category] = {}
-            if context not in questions[category]:
-                questions[category][context] = {}
-            
-            questions[category][context][q['question_id']] = {
-                "question": q['question_text'],
-                "type": q['question_type'],
-                "intent": q['intent'],
-                "affects_causes": q['affects_causes'],
-                "yes_updates": q['yes_updates'],
-                "no_updates": q['no_updates'],
-                "source": "learned"
-            }
-        
-        with open(questions_file, 'w') as f:
-            json.dump(questions, f, indent=2)
+        questions = _load_json(questions_file) if questions_file.exists() else {}
+        
+        questions_exported = 0
+        async with self.db.acquire() as conn:
+            async with conn.transaction():
+                async for q in conn.cursor("""
+                    SELECT * FROM learned_questions
+                    WHERE approved = TRUE AND information_gain_avg >= $1
+                """, self.MIN_INFO_GAIN, prefetch=1000):
+                    category = q['category']
+                    context = q['issue_context']
+
+                    if category not in questions:
+                        questions[category] = {}
+                    if context not in questions[category]:
+                        questions[category][context] = {}
+
+                    questions[category][context][q['question_id']] = {
+                        "question": q['question_text'],
+                        "type": q['question_type'],
+                        "intent": q['intent'],
+                        "affects_causes": q['affects_causes'],
+                        "yes_updates": q['yes_updates'],
+                        "no_updates": q['no_updates'],
+                        "source": "learned"
+                    }
+        
+        _dump_json_atomic(questions_file, questions)
         
         print(f"✅ Exported learned questions to {questions_file}")
         
         return {
-            "patterns_exported": len(patterns),
-            "questions_exported": len(learned_q)
+            "patterns_exported": patterns_exported,
+            "questions_exported": questions_exported
         }
 
 
@@ -502,22 +544,22 @@ async def run_learning_cycle(db_pool: asyncpg.Pool):
     
     print("🧠 Starting learning cycle...")
     
-    # Discover patterns
+    # The three analysis stages touch disjoint tables, so they overlap
+    # on the connection pool; the cycle takes as long as the slowest
+    # stage instead of the sum (needs a pool of >= 3 connections)
     print("\n[1/4] Discovering new patterns...")
-    patterns = await engine.discover_new_patterns(lookback_days=7)
+    print("[2/4] Generating new questions...")
+    print("[3/4] Updating question effectiveness...")
+    patterns, questions, _ = await asyncio.gather(
+        engine.discover_new_patterns(lookback_days=7),
+        engine.generate_new_questions(lookback_days=14),
+        engine.update_question_effectiveness()
+    )
     print(f"   Found {len(patterns)} new pattern candidates")
-    
-    # Generate questions
-    print("\n[2/4] Generating new questions...")
-    questions = await engine.generate_new_questions(lookback_days=14)
     print(f"   Generated {len(questions)} question candidates")
-    
-    # Update analytics
-    print("\n[3/4] Updating question effectiveness...")
-    await engine.update_question_effectiveness()
     print(f"   ✓ Analytics updated")
     
-    # Export approved learnings
+    # Export runs after the gather: it reads what the stages wrote
     print("\n[4/4] Exporting approved patterns...")
     result = await engine.export_to_json()
     print(f"   ✓ Exported {result['patterns_exported']} patterns")
@@ -5,10 +5,101 @@ Converts PDFs to structured knowledge base for ML diagnosis
 
 import os
 import json
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Tuple
 import re
 
+try:
+    import ahocorasick  # pyahocorasick - single-pass multi-keyword matching
+except ImportError:
+    ahocorasick = None
+
+try:
+    import orjson  # Rust JSON encoder for the knowledge-base dump
+except ImportError:
+    orjson = None
+
+# Patterns compiled once at import: the parse loop runs them against
+# every window of every manual, so per-call re-compilation/cache lookups
+# would sit directly on the hot path
+_ISSUE_PATTERN_SPECS = (
+    (r"(?:won\'t|not|no|cannot)\s+(?:turn\s+on|boot|start|power)", "no_boot"),
+    (r"(?:black|blank|dark)\s+screen", "black_screen"),
+    (r"(?:overheat|hot|thermal)", "overheating"),
+    (r"(?:battery|charging)\s+(?:issue|problem|not)", "battery_issue"),
+    (r"(?:fan|noise|loud)", "fan_issue"),
+    (r"(?:keyboard|key)\s+(?:not|stuck|broken)", "keyboard_issue"),
+    (r"(?:slow|performance|lag)", "performance_issue"),
+    (r"(?:wifi|wireless|network)\s+(?:not|issue)", "wifi_issue"),
+    (r"(?:display|lcd|screen)\s+(?:crack|damage|broken)", "screen_damage"),
+    (r"(?:hard\s+drive|hdd|ssd)\s+(?:fail|error|not)", "storage_issue")
+)
+
+# All issue patterns fused into one alternation with the issue type as
+# the group name: a single automaton walks the text once and
+# m.lastgroup says which issue fired, instead of ten separate scans.
+# The patterns have no backreferences or lookarounds, so when google-re2
+# is installed the scan runs on its linear-time DFA instead of re's
+# backtracking NFA - several times faster on multi-megabyte manuals
+_COMBINED_ISSUE_PATTERN = "|".join(
+    f"(?P<{issue_type}>{pattern})" for pattern, issue_type in _ISSUE_PATTERN_SPECS
+)
+# The scan runs against a text lowercased once per document, so the
+# patterns are plain lowercase literals with no IGNORECASE flag - that
+# skips re's per-character case-fold work in the inner loop. Compiled
+# as bytes: the document is projected to ASCII bytes (length-preserving,
+# so offsets stay valid for the str copy) and sre's bytes path skips
+# Unicode table lookups entirely
+try:
+    import re2
+    _COMBINED_ISSUE_RE = re2.compile(_COMBINED_ISSUE_PATTERN.encode())
+except ImportError:
+    _COMBINED_ISSUE_RE = re.compile(_COMBINED_ISSUE_PATTERN.encode())
+
+# Bounded quantifiers: only the first 300 chars of a step or warning
+# are ever kept, so letting the NFA walk further only feeds backtracking
+# on pathological inputs. Step/warning patterns are pure ASCII and run
+# on the bytes copy; the bullet pattern keeps the str engine because
+# the bullet glyph is non-ASCII
+_STEP_RE = re.compile(rb'(?:^|\n)\s*(\d+[\.\)]\s*.{0,300}?)(?=\n\s*\d+[\.\)]|\n\n|$)', re.MULTILINE)
+_BULLET_RE = re.compile(r'(?:^|\n)\s*[•\-\*]\s*(.+?)(?=\n\s*[•\-\*]|\n\n|$)', re.MULTILINE)
+
+# Applied to lowercased text, so no IGNORECASE needed
+_SYMPTOM_RES = tuple(re.compile(p) for p in [
+    r"symptom[s]?:?\s*(.+)",
+    r"problem:?\s*(.+)",
+    r"issue:?\s*(.+)",
+    r"if\s+(.+?),\s+then"
+])
+
+# Common tools
+_TOOL_KEYWORDS = (
+    "screwdriver", "torx", "phillips", "flathead",
+    "thermal paste", "spudger", "pry tool",
+    "multimeter", "esd", "antistatic",
+    "hex", "allen", "tweezers"
+)
+
+# Display form precomputed once; the keyword set is fixed, so calling
+# str.title() per section per tool was pure rework
+_TOOL_TITLES = {tool: tool.title() for tool in _TOOL_KEYWORDS}
+
+# One Aho-Corasick pass over each section replaces thirteen independent
+# substring scans when pyahocorasick is available
+if ahocorasick is not None:
+    _TOOL_AC = ahocorasick.Automaton()
+    for _tool in _TOOL_KEYWORDS:
+        _TOOL_AC.add_word(_tool, _tool)
+    _TOOL_AC.make_automaton()
+else:
+    _TOOL_AC = None
+
+_WARNING_RE = re.compile(
+    rb'(?:warning|caution|important|danger|note):?\s*([\s\S]{0,300}?)(?=\n\n|warning|caution|$)'
+)
+
 
 class ManualExtractor:
     """Extract repair procedures from OEM PDF manuals"""
@@ -26,14 +117,29 @@ class ManualExtractor:
         pdf_files = list(self.manuals_dir.rglob("*.pdf"))
         print(f"Found {len(pdf_files)} manual PDFs")
         
-        for pdf_path in pdf_files:
-            print(f"\n  Processing: {pdf_path.name}")
-            try:
-                knowledge = self._extract_pdf(pdf_path)
-                self.knowledge_base.extend(knowledge)
-                print(f"    ✓ Extracted {len(knowledge)} procedures")
-            except Exception as e:
-                print(f"    ✗ Error: {e}")
+        if len(pdf_files) > 1:
+            # PDF parsing and regex extraction are CPU-bound and
+            # independent per file - fan the manuals out across cores
+            with ProcessPoolExecutor() as executor:
+                futures = [(pdf_path, executor.submit(_extract_pdf_worker, pdf_path))
+                           for pdf_path in pdf_files]
+                for pdf_path, future in futures:
+                    print(f"\n  Processing: {pdf_path.name}")
+                    try:
+                        knowledge = future.result()
+                        self.knowledge_base.extend(knowledge)
+                        print(f"    ✓ Extracted {len(knowledge)} procedures")
+                    except Exception as e:
+                        print(f"    ✗ Error: {e}")
+        else:
+            for pdf_path in pdf_files:
+                print(f"\n  Processing: {pdf_path.name}")
+                try:
+                    knowledge = self._extract_pdf(pdf_path)
+                    self.knowledge_base.extend(knowledge)
+                    print(f"    ✓ Extracted {len(knowledge)} procedures")
+                except Exception as e:
+                    print(f"    ✗ Error: {e}")
         
         print(f"\n✓ Total procedures extracted: {len(self.knowledge_base)}")
         return self.knowledge_base
@@ -54,32 +160,32 @@ class ManualExtractor:
         brand = pdf_path.parent.name
         manual_type = self._classify_manual_type(pdf_path.name)
         
-        full_text = ""
-        images = []
+        # Collect page texts in a list and join once: += on a growing
+        # string recopies the whole document every page
+        parts = []
+        total_images = 0
         
-        # Extract text and images from each page
+        # Extract text and count images from each page
         for page_num, page in enumerate(doc):
-            # Extract text
-            text = page.get_text()
-            full_text += f"\n--- Page {page_num + 1} ---\n{text}"
+            # Build the TextPage explicitly and pull plain text straight
+            # from it, so MuPDF renders the page's display list exactly
+            # once; flags=0 turns off ligature/whitespace preservation
+            # and image info collection - the downstream regexes only
+            # need reading-order text
+            textpage = page.get_textpage(flags=0)
+            text = textpage.extractText()
+            textpage = None
+            parts.append(f"\n--- Page {page_num + 1} ---\n{text}")
             
-            # Extract images
-            image_list = page.get_images()
-            for img_index, img in enumerate(image_list):
-                try:
-                    xref = img[0]
-                    base_image = doc.extract_image(xref)
-                    image_data = {
-                        "page": page_num + 1,
-                        "format": base_image["ext"],
-                        "size": len(base_image["image"]),
-                        "xref": xref
-                    }
-                    images.append(image_data)
-                except:
-                    pass
+            # Only the image count survives into the metadata, so skip
+            # doc.extract_image() - decompressing every pixmap just to
+            # measure it was the most expensive per-page work after text.
+            # full=False stays with the shallow resource scan, which
+            # never touches the display list
+            total_images += len(page.get_images(full=False))
         
         doc.close()
+        full_text = "".join(parts)
         
         # Parse procedures from text
         procedures = self._parse_procedures(full_text, brand, manual_type)
@@ -89,7 +195,7 @@ class ManualExtractor:
             proc["source_file"] = pdf_path.name
             proc["brand"] = brand
             proc["manual_type"] = manual_type
-            proc["total_images"] = len(images)
+            proc["total_images"] = total_images
         
         return procedures
     
@@ -107,13 +213,13 @@ class ManualExtractor:
         manual_type = self._classify_manual_type(pdf_path.name)
         
         with pdfplumber.open(pdf_path) as pdf:
-            full_text = ""
+            parts = []
             for page in pdf.pages:
                 text = page.extract_text()
                 if text:
-                    full_text += f"\n{text}\n"
+                    parts.append(f"\n{text}\n")
         
-        procedures = self._parse_procedures(full_text, brand, manual_type)
+        procedures = self._parse_procedures("".join(parts), brand, manual_type)
         
         for proc in procedures:
             proc["source_file"] = pdf_path.name
@@ -143,129 +249,135 @@ class ManualExtractor:
         
         procedures = []
         
-        # Common issues to look for
-        issue_patterns = [
-            (r"(?:won\'t|not|no|cannot)\s+(?:turn\s+on|boot|start|power)", "no_boot"),
-            (r"(?:black|blank|dark)\s+screen", "black_screen"),
-            (r"(?:overheat|hot|thermal)", "overheating"),
-            (r"(?:battery|charging)\s+(?:issue|problem|not)", "battery_issue"),
-            (r"(?:fan|noise|loud)", "fan_issue"),
-            (r"(?:keyboard|key)\s+(?:not|stuck|broken)", "keyboard_issue"),
-            (r"(?:slow|performance|lag)", "performance_issue"),
-            (r"(?:wifi|wireless|network)\s+(?:not|issue)", "wifi_issue"),
-            (r"(?:display|lcd|screen)\s+(?:crack|damage|broken)", "screen_damage"),
-            (r"(?:hard\s+drive|hdd|ssd)\s+(?:fail|error|not)", "storage_issue")
-        ]
-        
-        # Split text into sections
-        lines = text.split('\n')
-        current_section = []
-        
-        for i, line in enumerate(lines):
-            current_section.append(line)
+        # Case-fold once per document instead of paying IGNORECASE's
+        # per-character folding in every pattern; all extraction runs on
+        # the lowercased copy, the original case survives in raw_text
+        text_cf = text.lower()
+        if len(text_cf) != len(text):
+            # Rare Unicode case-folds change string length; offsets must
+            # line up between the two copies, so give up original case
+            text = text_cf
+        
+        # ASCII projection for the document-wide scans: 'replace' maps
+        # each non-ASCII char to a single '?', so byte offsets equal
+        # character offsets in text_cf and the slices below stay aligned
+        text_bytes = text_cf.encode('ascii', 'replace')
+        
+        # One scan per pattern over the full text, instead of re-running
+        # every pattern against a re-joined 50-line window for each line
+        # (which rescanned the same bytes ~50 times). A cumulative
+        # line-offset table lets each hit be mapped back to its line and
+        # the surrounding 50-line section sliced out directly.
+        lines = text_cf.split('\n')
+        offsets = [0]
+        for line in lines:
+            offsets.append(offsets[-1] + len(line) + 1)
+        
+        # Find every warning once up front; per-match extraction becomes
+        # a binary-search slice instead of re-running the DOTALL scan
+        # over each 50-line section
+        all_warnings = [(m.start(), m.group(1).strip().decode('ascii')[:300])
+                        for m in _WARNING_RE.finditer(text_bytes)]
+        warning_offsets = [off for off, _ in all_warnings]
+        
+        # Same treatment for numbered steps and bullets: the step
+        # pattern's lookahead is the costliest regex here, so run it once
+        # over the document and slice per section
+        all_steps = [(m.start(1), m.group(1).strip().decode('ascii'))
+                     for m in _STEP_RE.finditer(text_bytes)]
+        step_offsets = [off for off, _ in all_steps]
+        all_bullets = [(m.start(1), m.group(1).strip())
+                       for m in _BULLET_RE.finditer(text_cf)]
+        bullet_offsets = [off for off, _ in all_bullets]
+        
+        last_hit_lines = {}
+        seen = set()
+        for m in _COMBINED_ISSUE_RE.finditer(text_bytes):
+            issue_type = m.lastgroup
+            hit_line = bisect_right(offsets, m.start()) - 1
             
-            # Check if this section describes a repair procedure
-            section_text = '\n'.join(current_section[-50:])  # Last 50 lines
+            # Overlapping windows would have re-fired on the same
+            # text; skip hits still inside the previous section
+            last_hit_line = last_hit_lines.get(issue_type)
+            if last_hit_line is not None and hit_line - last_hit_line < 50:
+                continue
+
+            # Manuals usually state the issue first and then list the
+            # steps, so the section spans 50 lines either side of the hit
+            section_start = offsets[max(0, hit_line - 49)]
+            section_end = offsets[min(len(offsets) - 1, hit_line + 50)]
+            section_cf = text_cf[section_start:section_end]
+            
+            # Numbered steps in this section, falling back to bullets
+            steps = [t for _, t in all_steps[
+                bisect_left(step_offsets, section_start):
+                bisect_left(step_offsets, section_end)]]
+            if not steps:
+                steps = [t for _, t in all_bullets[
+                    bisect_left(bullet_offsets, section_start):
+                    bisect_left(bullet_offsets, section_end)]]
+            steps = [t for t in steps if 10 < len(t) < 300][:20]
             
-            for pattern, issue_type in issue_patterns:
-                if re.search(pattern, section_text, re.IGNORECASE):
-                    # Extract solution steps
-                    steps = self._extract_steps(section_text)
-                    
-                    if len(steps) > 0:
-                        procedures.append({
-                            "issue_type": issue_type,
-                            "symptoms": self._extract_symptoms(section_text),
-                            "solution_steps": steps,
-                            "tools_needed": self._extract_tools(section_text),
-                            "warnings": self._extract_warnings(section_text),
-                            "raw_text": section_text[-1000:],  # Last 1000 chars
-                            "confidence": 0.7 if len(steps) > 3 else 0.5
-                        })
+            if len(steps) > 0:
+                # Advance the dedup window only for hits that actually
+                # yield steps, so a bare mention of an issue cannot
+                # shadow a real procedure a few lines further down
+                last_hit_lines[issue_type] = hit_line
+
+                # Repeated boilerplate (page headers, recurring notes)
+                # can fire the same issue with identical steps far apart;
+                # dedupe on content before running the other extractors
+                key = (issue_type, tuple(steps[:5]))
+                if key in seen:
+                    continue
+                seen.add(key)
+                
+                lo = bisect_left(warning_offsets, section_start)
+                hi = bisect_left(warning_offsets, section_end)
+                
+                procedures.append({
+                    "issue_type": issue_type,
+                    "symptoms": self._extract_symptoms(section_cf),
+                    "solution_steps": steps,
+                    "tools_needed": self._extract_tools(section_cf),
+                    "warnings": [w for _, w in all_warnings[lo:hi]][:5],
+                    "raw_text": text[section_start:section_end][-1000:],  # Last 1000 chars
+                    "confidence": 0.7 if len(steps) > 3 else 0.5
+                })
         
         return procedures
     
-    def _extract_steps(self, text: str) -> List[str]:
-        """Extract step-by-step instructions"""
-        
-        steps = []
-        
-        # Look for numbered steps
-        step_pattern = r'(?:^|\n)\s*(\d+[\.\)]\s*.+?)(?=\n\s*\d+[\.\)]|\n\n|$)'
-        matches = re.findall(step_pattern, text, re.MULTILINE)
-        
-        if matches:
-            steps = [m.strip() for m in matches]
-        
-        # Look for bullet points
-        if not steps:
-            bullet_pattern = r'(?:^|\n)\s*[•\-\*]\s*(.+?)(?=\n\s*[•\-\*]|\n\n|$)'
-            matches = re.findall(bullet_pattern, text, re.MULTILINE)
-            if matches:
-                steps = [m.strip() for m in matches]
-        
-        # Clean up steps
-        steps = [s for s in steps if len(s) > 10 and len(s) < 300]
-        
-        return steps[:20]  # Max 20 steps
-    
     def _extract_symptoms(self, text: str) -> List[str]:
         """Extract symptom descriptions"""
         
         symptoms = []
         
-        symptom_indicators = [
-            r"symptom[s]?:?\s*(.+)",
-            r"problem:?\s*(.+)",
-            r"issue:?\s*(.+)",
-            r"if\s+(.+?),\s+then"
-        ]
-        
-        for pattern in symptom_indicators:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            symptoms.extend([m.strip()[:200] for m in matches])
+        for pattern in _SYMPTOM_RES:
+            symptoms.extend([m.strip()[:200] for m in pattern.findall(text)])
         
         return symptoms[:5]
     
-    def _extract_tools(self, text: str) -> List[str]:
-        """Extract required tools"""
-        
-        tools = []
-        
-        # Common tools
-        tool_keywords = [
-            "screwdriver", "torx", "phillips", "flathead",
-            "thermal paste", "spudger", "pry tool",
-            "multimeter", "esd", "antistatic",
-            "hex", "allen", "tweezers"
-        ]
-        
-        text_lower = text.lower()
-        for tool in tool_keywords:
-            if tool in text_lower:
-                tools.append(tool.title())
-        
-        return list(set(tools))[:10]
-    
-    def _extract_warnings(self, text: str) -> List[str]:
-        """Extract warnings and cautions"""
-        
-        warnings = []
-        
-        warning_pattern = r'(?:WARNING|CAUTION|IMPORTANT|DANGER|NOTE):?\s*(.+?)(?=\n\n|WARNING|CAUTION|$)'
-        matches = re.findall(warning_pattern, text, re.IGNORECASE | re.DOTALL)
+    def _extract_tools(self, text_lower: str) -> List[str]:
+        """Extract required tools (expects already-lowercased text)"""
         
-        warnings = [m.strip()[:300] for m in matches]
+        if _TOOL_AC is not None:
+            seen = {tool for _, tool in _TOOL_AC.iter(text_lower)}
+        else:
+            seen = {tool for tool in _TOOL_KEYWORDS if tool in text_lower}
         
-        return warnings[:5]
+        return [_TOOL_TITLES[tool] for tool in seen][:10]
     
     def save_knowledge_base(self, output_file: str = "knowledge_base.json"):
         """Save extracted knowledge to JSON"""
         
         output_path = Path(output_file)
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(self.knowledge_base, f, indent=2, ensure_ascii=False)
+        if orjson is not None:
+            output_path.write_bytes(
+                orjson.dumps(self.knowledge_base, option=orjson.OPT_INDENT_2))
+        else:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(self.knowledge_base, f, indent=2, ensure_ascii=False)
         
         print(f"\n✓ Knowledge base saved to: {output_path}")
         print(f"  Total procedures: {len(self.knowledge_base)}")
@@ -286,6 +398,11 @@ class ManualExtractor:
         return [p for p in self.knowledge_base if p.get('issue_type') == issue_type]
 
 
+def _extract_pdf_worker(pdf_path: Path) -> List[Dict]:
+    """Module-level entry point so worker processes can pickle the task"""
+    return ManualExtractor()._extract_pdf(pdf_path)
+
+
 if __name__ == "__main__":
     # Extract knowledge from all manuals
     extractor = ManualExtractor("../manuals")